@@ -0,0 +1,88 @@
+"""Parsing, checking and password hashing for bulk account creation.
+
+The hashing pool is only handed werkzeug's generate_password_hash. Its
+spawned workers still import the main module as `__mp_main__`: app.py itself
+when the server runs as `python app.py` (the server only starts behind its
+`__main__` guard), or the launcher script under `flask` or gunicorn.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from werkzeug.security import generate_password_hash
+
+USERNAME_MAX_LENGTH = 80  # User.username
+EMAIL_MAX_LENGTH = 120  # User.email
+
+
+def parse_users(text: str, format: str) -> List[Dict[str, Any]]:
+    """Parse users from CSV with a username,email,password header, or from a JSON list of objects."""
+    if format == 'csv':
+        return [{key.strip(): (value or '').strip() for key, value in row.items() if key}
+                for row in csv.DictReader(io.StringIO(text))]
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get('users')
+    if not isinstance(data, list):
+        raise ValueError('Expected a list of users')
+    return data
+
+
+def check_users(rows: List[Any]) -> Tuple[List[Tuple[int, Dict[str, str]]], List[Dict[str, Any]]]:
+    """Split rows into (row number, user) pairs worth inserting and per-row errors.
+
+    Rows are numbered from 1. A missing password is replaced by a generated one,
+    flagged with 'generated' so it can be handed to the contestant.
+    """
+    users = []
+    errors = []
+    seen_usernames = set()
+    seen_emails = set()
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': number, 'error': 'Expected an object with username, email and password'})
+            continue
+        username = str(row.get('username') or '').strip()
+        email = str(row.get('email') or '').strip()
+        password = str(row.get('password') or '')
+
+        error = None
+        if not username or not email:
+            error = 'Username and email are required'
+        elif len(username) > USERNAME_MAX_LENGTH or len(email) > EMAIL_MAX_LENGTH:
+            error = f'Username or email is too long (at most {USERNAME_MAX_LENGTH} and {EMAIL_MAX_LENGTH} characters)'
+        elif '@' not in email:
+            error = 'Invalid email'
+        elif username in seen_usernames:
+            error = 'Username appears more than once'
+        elif email.lower() in seen_emails:
+            error = 'Email appears more than once'
+        if error is not None:
+            errors.append({'row': number, 'username': username, 'error': error})
+            continue
+
+        seen_usernames.add(username)
+        seen_emails.add(email.lower())
+        user = {'username': username, 'email': email, 'password': password}
+        if not password:
+            user['password'] = secrets.token_urlsafe(9)
+            user['generated'] = True
+        users.append((number, user))
+    return users, errors
+
+
+def hash_passwords(passwords: List[str], workers: int = None) -> List[str]:
+    """Hash passwords in a pool of processes, one per core by default."""
+    if not passwords:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    if workers == 1:
+        return [generate_password_hash(password) for password in passwords]
+    # Spawned workers, forking the multi-threaded server is not safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return list(executor.map(generate_password_hash, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
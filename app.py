@@ -1,25 +1,159 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for
+from flask import Flask, request, jsonify, render_template, redirect, url_for, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
+import click
+import csv
+import gzip
+import hashlib
+import hmac
 import json
 import os
+import tempfile
+import time
 from datetime import datetime
+from functools import partial
 import pytz
-from judge.judge import judge_submission
-from sqlalchemy import select
+from accounts import check_users, hash_passwords, parse_users
+from messagequeue import DatabaseManager
+from standings import apply_event, board, empty_state, rank_rows, reveal_steps
+from judge.judge import compile_checker, judge_submission, sandbox_pool
+from judge.jobqueue import JobQueue
+from judge.metrics import Registry
+from judge.package import PackageError, import_package
+from judge.pool import PRIORITY_REJUDGE, PRIORITY_RUN, PRIORITY_SUBMIT, JudgePool, QueueFull
+from judge.testdata import TestDataStore
+from sqlalchemy import event, insert, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import load_only
+import threading
+
+try:
+    import brotli
+except ImportError:  # Responses are only gzipped without it
+    brotli = None
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'key'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///coding_contest.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),  # Connections kept open for request and judge threads
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': 30,
+    'connect_args': {'timeout': 30}  # Seconds to wait for the SQLite write lock
+}
+app.config['JUDGE_WORKERS'] = int(os.environ.get('JUDGE_WORKERS', 4))  # Number of judge worker threads
+app.config['JUDGE_USER_LIMIT'] = int(os.environ.get('JUDGE_USER_LIMIT', 2))  # Jobs of one user judged at the same time
+app.config['RUN_CODE_WORKERS'] = int(os.environ.get('RUN_CODE_WORKERS', max(1, app.config['JUDGE_WORKERS'] // 2)))  # Workers /run_code may occupy
+app.config['RUN_CODE_QUEUE_LIMIT'] = int(os.environ.get('RUN_CODE_QUEUE_LIMIT', 2 * app.config['JUDGE_WORKERS']))  # Waiting /run_code requests before 429s
+app.config['SUBMIT_PENDING_LIMIT'] = int(os.environ.get('SUBMIT_PENDING_LIMIT', 5))  # Pending submissions per user before 429s
+app.config['JUDGE_MODE'] = os.environ.get('JUDGE_MODE', 'local')  # 'local' judges in this process, 'remote' leaves it to `python -m judge.worker`
+app.config['JUDGE_RESULT_POLL_INTERVAL'] = float(os.environ.get('JUDGE_RESULT_POLL_INTERVAL', 0.5))  # in seconds, remote mode only
+app.config['RUN_CODE_TIMEOUT'] = float(os.environ.get('RUN_CODE_TIMEOUT', 120))  # in seconds a /run_code request waits for a remote worker
+app.config['TESTDATA_DIR'] = os.environ.get('TESTDATA_DIR', 'testdata')  # Content-addressed test input/output files
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))  # Processes hashing passwords for bulk user creation
+app.config['USER_INSERT_BATCH_SIZE'] = 500  # Users inserted per transaction by bulk user creation
+app.config['PACKAGE_MAX_MB'] = int(os.environ.get('PACKAGE_MAX_MB', 1024))  # Largest problem package, and largest total size of its tests
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # Bearer token for scraping /metrics without an admin session
+app.config['VERDICT_CACHE'] = os.environ.get('VERDICT_CACHE', '1') != '0'  # Reuse verdicts of identical code on identical tests
+app.config['VERDICT_CACHE_RUN_TTL'] = float(os.environ.get('VERDICT_CACHE_RUN_TTL', 3600))  # in seconds, /run_code entries only
+app.config['STANDINGS_CHECKPOINT_INTERVAL'] = int(os.environ.get('STANDINGS_CHECKPOINT_INTERVAL', 1000))  # Score events between standings checkpoints
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # in bytes; smaller JSON and HTML responses are sent as is
+app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE')  # None for one process, 'database', or a Redis/RabbitMQ URL to share events between processes
+
+
+# Metrics exported at /metrics
+metrics = Registry()
+http_request_duration = metrics.histogram('cms_http_request_duration_seconds', 'Time spent handling HTTP requests.', ('method', 'route', 'status'))
+judge_phase_duration = metrics.histogram('cms_judge_phase_duration_seconds', 'Time spent in each judging phase.', ('language', 'phase'))
+submissions_judged = metrics.counter('cms_submissions_judged_total', 'Submissions judged, by final status.', ('language', 'status'))
+test_verdicts = metrics.counter('cms_test_verdicts_total', 'Test case verdicts, skipped tests excluded.', ('language', 'verdict'))
+socket_emits = metrics.counter('cms_socket_emits_total', 'Socket.IO events emitted.', ('event',))
+verdict_cache_lookups = metrics.counter('cms_verdict_cache_lookups_total', 'Verdict cache lookups, by kind and hit or miss.', ('kind', 'result'))
+
+def emit_event(event, data, **kwargs):
+    """Emit a Socket.IO event and count it."""
+    socket_emits.inc(event=event)
+    socketio.emit(event, data, **kwargs)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
 
+@app.after_request
+def record_request_duration(response):
+    if 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_request_duration.observe(time.perf_counter() - g.request_start,
+                                      method=request.method, route=route, status=response.status_code)
+    return response
 
-# Initialize SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Compressed bodies for the encodings we can produce, best first
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/css', 'application/javascript')
+ENCODERS = {'gzip': lambda body: gzip.compress(body, compresslevel=6)}
+if brotli is not None:
+    ENCODERS = {'br': lambda body: brotli.compress(body, quality=5), **ENCODERS}
 
-# Load contest configuration
+def pick_encoding(size):
+    """The encoding to send a body of `size` bytes with, or None to send it as is."""
+    if size < app.config['COMPRESS_MIN_SIZE']:
+        return None
+    return request.accept_encodings.best_match(list(ENCODERS))
+
+@app.after_request
+def compress_response(response):
+    """Compress large JSON and HTML responses that cached_response() did not already encode."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    encoding = pick_encoding(response.content_length or 0)
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.set_data(ENCODERS[encoding](response.get_data()))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag is not None:
+            response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+# Bodies of read-heavy endpoints, kept until the token they were built for changes
+response_cache = {}
+response_cache_lock = threading.Lock()
+
+def cached_response(key, token, build, mimetype='application/json'):
+    """Send the body build() makes for `token`, building it only when the cached one is for another token.
+
+    Responses carry a strong ETag of the body and the encoding, get a 304 when
+    it matches If-None-Match, and are compressed once per body and encoding.
+    """
+    with response_cache_lock:
+        entry = response_cache.get(key)
+    if entry is None or entry['token'] != token:
+        body = build()
+        if isinstance(body, str):
+            body = body.encode()
+        entry = {'token': token, 'body': body, 'etag': hashlib.sha256(body).hexdigest()[:32], 'encoded': {}}
+        with response_cache_lock:
+            response_cache[key] = entry
+    
+    encoding = pick_encoding(len(entry['body']))
+    if encoding is None:
+        response = app.response_class(entry['body'], mimetype=mimetype)
+        response.set_etag(entry['etag'])
+    else:
+        if encoding not in entry['encoded']:
+            entry['encoded'][encoding] = ENCODERS[encoding](entry['body'])
+        response = app.response_class(entry['encoded'][encoding], mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{entry['etag']}-{encoding}")
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'private, no-cache'  # Browsers revalidate with the ETag every time
+    return response.make_conditional(request)
+
+# Load contest configuration; the file seeds the contest_settings table, which is shared by every web process
 def load_contest_config():
     try:
         with open('config/contest_config.json', 'r') as f:
@@ -28,8 +162,39 @@ def load_contest_config():
         return {'contest_name': 'Coding Contest'}  # Default name
 
 contest_config = load_contest_config()
+contest_config_state = {'version': None}  # Version of the contest_settings row contest_config was loaded from
+
+test_data = TestDataStore(app.config['TESTDATA_DIR'])
 
 db = SQLAlchemy(app)
+
+# Initialize SocketIO; with a message queue, events emitted by any web process reach the clients of all of them
+if app.config['SOCKETIO_MESSAGE_QUEUE'] == 'database':
+    with app.app_context():
+        socketio_queue = DatabaseManager(db.engine)
+    socketio = SocketIO(app, cors_allowed_origins="*", client_manager=socketio_queue)
+else:
+    socketio_queue = None
+    socketio = SocketIO(app, cors_allowed_origins="*", message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'])
+
+def contest_now():
+    """Current time in the contest time zone, naive like the stored timestamps."""
+    return datetime.now(pytz.timezone(contest_config.get('time_zone', 'UTC'))).replace(tzinfo=None)
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection: WAL lets readers run alongside the single writer."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')  # Durable with WAL, only syncs at checkpoints
+    cursor.execute('PRAGMA busy_timeout=30000')
+    cursor.execute('PRAGMA cache_size=-16000')  # 16 MB page cache per connection
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -56,7 +221,10 @@ class Problem(db.Model):
     difficulty = db.Column(db.String(20), nullable=False)
     time_limit = db.Column(db.Integer, nullable=False)  # in milliseconds
     memory_limit = db.Column(db.Integer, nullable=False)  # in MB
-    batches = db.Column(db.JSON, nullable=False)  # List of batches, each containing test cases and points
+    batches = db.Column(db.JSON, nullable=False)  # List of batches with points and test cases (hashes and sizes of files in test_data)
+    checker = db.Column(db.JSON)  # How outputs are compared, see judge.judge.comparator_factory; None is an exact match
+    total_points = db.Column(db.Integer, nullable=False, default=0)  # Sum of the batch points, kept in step with batches
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped when the problem is replaced, for cached responses
     submissions = db.relationship('Submission', backref='problem', lazy=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
@@ -70,9 +238,91 @@ class Submission(db.Model):
     execution_time = db.Column(db.Float)  # in milliseconds
     memory_used = db.Column(db.Float)  # in KB
     points_earned = db.Column(db.Integer, default=0)  # Points earned for this submission
-    submitted_at = db.Column(db.DateTime, default=datetime.now(pytz.timezone(contest_config.get('time_zone', 'UTC'))))
+    submitted_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.timezone(contest_config.get('time_zone', 'UTC'))))
     batch_results = db.Column(db.JSON) # List of batches, containing result of each test case
     submitted_while_frozen = db.Column(db.Boolean, nullable=False, default=False)
+    timings = db.Column(db.JSON)  # Milliseconds spent queued, compiling, running, comparing and writing results
+
+    __table_args__ = (
+        db.Index('ix_submission_user_problem_status', 'user_id', 'problem_id', 'status'),  # Per-user views and standings
+        db.Index('ix_submission_status', 'status'),  # Pending queue recovery and standings rebuilds
+        db.Index('ix_submission_user_id', 'user_id', 'id'),  # Paging through a user's submissions
+    )
+
+class VerdictCache(db.Model):
+    # Judge results keyed by verdict_key(), so identical resubmissions are not judged again
+    key = db.Column(db.String(64), primary_key=True)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problem.id'), index=True)  # None for /run_code entries
+    result = db.Column(db.JSON, nullable=False)  # Status, points, time, memory and batch results
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+
+class Standing(db.Model):
+    # Best accepted submission per (user, problem), maintained by the judge so the leaderboard is a single read
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problem.id'), primary_key=True)
+    points = db.Column(db.Integer, nullable=False, default=0)  # Best points over all submissions
+    submission_time = db.Column(db.DateTime)
+    public_points = db.Column(db.Integer, nullable=False, default=0)  # Best points shown while the leaderboard is frozen
+    public_submission_time = db.Column(db.DateTime)
+
+class ContestSettings(db.Model):
+    # Single row holding contest_config; processes reload it when the version changes
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.JSON, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+class ScoreEvent(db.Model):
+    # Append-only log of what changed the standings, folded by standings.apply_event
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # 'judged', 'reset', 'freeze' or 'unfreeze'
+    submission_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer)  # A reset of one user's problem, or None
+    problem_id = db.Column(db.Integer)  # A reset of one problem, or None to reset everything
+    status = db.Column(db.String(20))
+    points = db.Column(db.Integer)
+    submitted_at = db.Column(db.DateTime)
+    frozen = db.Column(db.Boolean, nullable=False, default=False)  # Submitted while the leaderboard was frozen
+    created_at = db.Column(db.DateTime, nullable=False, default=contest_now, index=True)
+
+class StandingsCheckpoint(db.Model):
+    # Fold of the score events up to event_id, so past standings replay only the events after it
+    event_id = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+def set_contest_config(data, version):
+    """Replace contest_config in place, so modules holding a reference see the change."""
+    contest_config.update(data)
+    for key in set(contest_config) - set(data):
+        del contest_config[key]
+    contest_config_state['version'] = version
+
+def refresh_contest_config():
+    """Reload contest_config if another process changed it; a primary key lookup when nothing changed."""
+    version = db.session.execute(select(ContestSettings.version).where(ContestSettings.id == 1)).scalar()
+    if version is not None and version != contest_config_state['version']:
+        row = db.session.execute(select(ContestSettings.data, ContestSettings.version).where(ContestSettings.id == 1)).one()
+        set_contest_config(row.data, row.version)
+
+def change_contest_config(changes):
+    """Apply `changes` to the shared contest settings in the current transaction.
+
+    Returns the settings before the change, then the new settings and version
+    for set_contest_config() once the transaction is committed.
+    """
+    # Bumping the version first takes the write lock, so concurrent changes do not overwrite each other
+    version = db.session.execute(
+        update(ContestSettings).where(ContestSettings.id == 1)
+        .values(version=ContestSettings.version + 1).returning(ContestSettings.version)
+    ).scalar_one()
+    previous = db.session.execute(select(ContestSettings.data).where(ContestSettings.id == 1)).scalar_one()
+    data = dict(previous, **changes)
+    db.session.execute(update(ContestSettings).where(ContestSettings.id == 1).values(data=data))
+    return previous, data, version
+
+@app.before_request
+def check_contest_config():
+    refresh_contest_config()
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -93,7 +343,9 @@ def init_admin():
 def index():
     if not current_user.is_authenticated:
         return redirect(url_for('login'))
-    return render_template('index.html')
+    # The page is the same for everyone, only the template file changing makes a new body
+    template_mtime = os.path.getmtime(os.path.join(app.root_path, app.template_folder, 'index.html'))
+    return cached_response('index', template_mtime, lambda: render_template('index.html'), mimetype='text/html')
 
 @app.route('/register', methods=['POST'])
 def register():
@@ -110,6 +362,7 @@ def register():
     
     db.session.add(user)
     db.session.commit()
+    invalidate_leaderboard()
     
     return jsonify({'message': 'Registration successful'}), 201
 
@@ -155,9 +408,111 @@ def create_user():
     
     db.session.add(user)
     db.session.commit()
+    invalidate_leaderboard()
     
     return jsonify({'message': 'User created successfully'}), 201
 
+def create_users(rows):
+    """Create many users at once; returns the number created, per-row errors and generated passwords."""
+    users, errors = check_users(rows)
+    
+    # Existing usernames and emails in one query per chunk instead of two per user
+    taken_usernames, taken_emails = set(), set()
+    for start in range(0, len(users), 500):
+        chunk = [user for _, user in users[start:start + 500]]
+        rows_taken = db.session.execute(select(User.username, User.email).where(
+            User.username.in_([user['username'] for user in chunk])
+            | db.func.lower(User.email).in_([user['email'].lower() for user in chunk])))
+        for username, email in rows_taken:
+            taken_usernames.add(username)
+            taken_emails.add(email.lower())  # Like check_users, emails differing in case are the same
+    available = []
+    for number, user in users:
+        if user['username'] in taken_usernames:
+            errors.append({'row': number, 'username': user['username'], 'error': 'Username already exists'})
+        elif user['email'].lower() in taken_emails:
+            errors.append({'row': number, 'username': user['username'], 'error': 'Email already exists'})
+        else:
+            available.append((number, user))
+    
+    hashes = hash_passwords([user['password'] for _, user in available], app.config['PASSWORD_HASH_WORKERS'])
+    
+    # Insert in batches; a batch that fails is retried row by row to report the offending rows
+    created = 0
+    batch_size = app.config['USER_INSERT_BATCH_SIZE']
+    for start in range(0, len(available), batch_size):
+        batch = [(number, {'username': user['username'], 'email': user['email'], 'password_hash': password_hash, 'is_admin': False})
+                 for (number, user), password_hash in zip(available[start:start + batch_size], hashes[start:start + batch_size])]
+        try:
+            db.session.execute(insert(User), [values for _, values in batch])
+            db.session.commit()
+            created += len(batch)
+            continue
+        except IntegrityError:
+            db.session.rollback()
+        for number, values in batch:
+            try:
+                db.session.execute(insert(User), [values])
+                db.session.commit()
+                created += 1
+            except IntegrityError:
+                db.session.rollback()
+                errors.append({'row': number, 'username': values['username'], 'error': 'Username or email already exists'})
+    if created:
+        invalidate_leaderboard()
+    
+    failed = {error['row'] for error in errors}
+    return {
+        'created': created,
+        'errors': sorted(errors, key=lambda error: error['row']),
+        # Passwords made up for rows without one, to hand out to the contestants
+        'passwords': [{'username': user['username'], 'password': user['password']}
+                      for number, user in available if user.get('generated') and number not in failed]
+    }
+
+@app.route('/create_users', methods=['POST'])
+@login_required
+def create_users_route():
+    """Create users from a JSON list, or from CSV when sent as text/csv."""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        format = 'csv' if request.mimetype == 'text/csv' else 'json'
+        rows = parse_users(request.get_data(as_text=True), format)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid user list: {str(e)}'}), 400
+    
+    try:
+        result = create_users(rows)
+    except Exception as e:
+        print(f"Error creating users: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    return jsonify(result), 201 if result['created'] else 200
+
+@app.cli.command('create-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--passwords', 'passwords_path', type=click.Path(dir_okay=False),
+              help='Write generated passwords to this CSV file.')
+def create_users_command(path, passwords_path):
+    """Create users from a CSV (username,email,password) or JSON file."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        rows = parse_users(text, 'csv' if path.lower().endswith('.csv') else 'json')
+    except ValueError as e:
+        raise click.ClickException(f'Invalid user list: {str(e)}')
+    result = create_users(rows)
+    for error in result['errors']:
+        print(f"Row {error['row']} ({error.get('username', '')}): {error['error']}")
+    if passwords_path and result['passwords']:
+        with open(passwords_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['username', 'password'])
+            writer.writeheader()
+            writer.writerows(result['passwords'])
+    print(f"Created {result['created']} users, {len(result['errors'])} rows failed")
+
 @app.route('/create_problem', methods=['POST'])
 @login_required
 def create_problem():
@@ -166,7 +521,6 @@ def create_problem():
     
     try:
         data = request.get_json()
-        print("Received data:", data)
         
         required_fields = ['title', 'description', 'difficulty', 'time_limit', 'memory_limit', 'batches']
         
@@ -195,33 +549,17 @@ def create_problem():
                     print("Invalid test case format")
                     return jsonify({'error': 'Each test case must have input and output'}), 400
         
-        # Generate shortname based on problem count
-        problem_count = Problem.query.count()
-        shortname = chr(65 + problem_count)  # A, B, C, etc.
-        
-        problem = Problem(
-            title=data['title'],
-            shortname=shortname,
-            description=data['description'],
-            difficulty=data['difficulty'],
-            time_limit=data['time_limit'],
-            memory_limit=data['memory_limit'],
-            batches=data['batches']
-        )
+        # Custom checkers are compiled now so every submission reuses the cached build
+        checker = data.get('checker')
+        error = validate_checker(checker)
+        if error is not None:
+            print(f"Invalid checker: {error}")
+            return jsonify({'error': error}), 400
         
-        db.session.add(problem)
-        db.session.commit()
-        print("Problem created successfully")
-        
-        # Emit WebSocket event for new problem
-        socketio.emit('new_problem', {
-            'id': problem.id,
-            'title': problem.title,
-            'shortname': problem.shortname,
-            'difficulty': problem.difficulty,
-            'time_limit': problem.time_limit,
-            'memory_limit': problem.memory_limit
-        })
+        problem = add_problem(data, [{
+            'points': batch['points'],
+            'test_cases': [test_data.store_test_case(test_case) for test_case in batch['test_cases']]
+        } for batch in data['batches']])
         
         return jsonify({'message': 'Problem created successfully', 'id': problem.id}), 201
     except Exception as e:
@@ -229,33 +567,132 @@ def create_problem():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def add_problem(data, batches):
+    """Create a problem from checked fields and stored test batches, and announce it."""
+    # Generate shortname based on problem count
+    problem_count = Problem.query.count()
+    shortname = chr(65 + problem_count)  # A, B, C, etc.
+    
+    problem = Problem(
+        title=data['title'],
+        shortname=shortname,
+        description=data['description'],
+        difficulty=data['difficulty'],
+        time_limit=data['time_limit'],
+        memory_limit=data['memory_limit'],
+        checker=data.get('checker'),
+        batches=batches,
+        total_points=sum(batch['points'] for batch in batches)
+    )
+    
+    db.session.add(problem)
+    db.session.commit()
+    invalidate_leaderboard()
+    print("Problem created successfully")
+    
+    # Emit WebSocket event for new problem
+    emit_event('new_problem', {
+        'id': problem.id,
+        'title': problem.title,
+        'shortname': problem.shortname,
+        'difficulty': problem.difficulty,
+        'time_limit': problem.time_limit,
+        'memory_limit': problem.memory_limit
+    })
+    return problem
+
+def import_problem_package(path, problem=None):
+    """Create a problem from a package, or replace the statement, limits, checker and tests of `problem`."""
+    metadata = import_package(path, test_data, app.config['PACKAGE_MAX_MB'] * 1024 * 1024)
+    error = validate_checker(metadata.get('checker'))
+    if error is not None:
+        raise PackageError(error)
+    if problem is None:
+        return add_problem(metadata, metadata['batches'])
+    
+    for field in ('title', 'description', 'difficulty', 'time_limit', 'memory_limit', 'checker'):
+        setattr(problem, field, metadata.get(field))
+    set_problem_batches(problem, metadata['batches'])
+    db.session.commit()
+    return problem
+
+@app.route('/import_problem', methods=['POST'])
+@login_required
+def import_problem():
+    """Import a zip package sent as the request body; `?problem_id=` replaces that problem instead."""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    problem = None
+    if request.args.get('problem_id') is not None:
+        problem = Problem.query.get_or_404(request.args.get('problem_id', type=int))
+    if request.content_length is not None and request.content_length > app.config['PACKAGE_MAX_MB'] * 1024 * 1024:
+        return jsonify({'error': f"Packages are limited to {app.config['PACKAGE_MAX_MB']} MB"}), 413
+    
+    # Spool the upload to disk, zip members are then read one at a time
+    fd, path = tempfile.mkstemp(prefix='cms-package-', suffix='.zip')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = request.stream.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+        status = 201 if problem is None else 200
+        problem = import_problem_package(path, problem)
+        return jsonify({'message': 'Problem imported successfully', 'id': problem.id}), status
+    except PackageError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print("Error importing problem:", str(e))
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        os.unlink(path)
+
 @app.route('/problems')
 @login_required
 def get_problems():
-    problems = Problem.query.order_by(Problem.created_at.desc()).all()
-    return jsonify([{
-        'id': p.id,
-        'title': p.title,
-        'shortname': p.shortname,
-        'difficulty': p.difficulty,
-        'time_limit': p.time_limit,
-        'memory_limit': p.memory_limit
-    } for p in problems])
+    token = tuple(db.session.execute(select(db.func.count(), db.func.max(Problem.id), db.func.sum(Problem.version))).one())
+    
+    def build():
+        problems = Problem.query.options(load_only(Problem.id, Problem.title, Problem.shortname, Problem.difficulty,
+                                                   Problem.time_limit, Problem.memory_limit)).order_by(Problem.created_at.desc()).all()
+        return json.dumps([{
+            'id': p.id,
+            'title': p.title,
+            'shortname': p.shortname,
+            'difficulty': p.difficulty,
+            'time_limit': p.time_limit,
+            'memory_limit': p.memory_limit
+        } for p in problems])
+    return cached_response('problems', token, build)
 
 @app.route('/problem/<int:problem_id>')
 @login_required
 def get_problem(problem_id):
-    problem = Problem.query.get_or_404(problem_id)
-    return jsonify({
-        'id': problem.id,
-        'title': problem.title,
-        'shortname': problem.shortname,
-        'description': problem.description,
-        'difficulty': problem.difficulty,
-        'time_limit': problem.time_limit,
-        'memory_limit': problem.memory_limit,
-        'batches': problem.batches
-    })
+    version = db.session.execute(select(Problem.version).where(Problem.id == problem_id)).scalar()
+    if version is None:
+        return jsonify({'error': 'Problem not found'}), 404
+    
+    def build():
+        problem = db.session.get(Problem, problem_id)
+        return json.dumps({
+            'id': problem.id,
+            'title': problem.title,
+            'shortname': problem.shortname,
+            'description': problem.description,
+            'difficulty': problem.difficulty,
+            'time_limit': problem.time_limit,
+            'memory_limit': problem.memory_limit,
+            # Only sample test cases are shown to contestants
+            'samples': [{
+                'input': test_data.read_text(test_case['input_hash']),
+                'output': test_data.read_text(test_case['output_hash'])
+            } for batch in problem.batches for test_case in batch['test_cases'] if test_case.get('sample')]
+        })
+    return cached_response(f'problem-{problem_id}', version, build)
 
 @app.route('/submit', methods=['POST'])
 @login_required
@@ -279,54 +716,305 @@ def submit():
 
         problem = Problem.query.get_or_404(data['problem_id'])
         
-        # Create submission record
-        count = Submission.query.count()
+        # A user flooding the judge waits for their earlier submissions first
+        pending = Submission.query.filter_by(user_id=current_user.id, status='PENDING').count()
+        if pending >= app.config['SUBMIT_PENDING_LIMIT']:
+            return too_many_requests('You have too many submissions waiting to be judged', retry_hint(PRIORITY_SUBMIT))
+        
+        # Create submission record, SQLite assigns the id
         submission = Submission(
             user_id=current_user.id,
             problem_id=problem.id,
             code=data['code'],
             language=data['language'],
             status='PENDING',
-            id=count,
             submitted_while_frozen=contest_config.get('leaderboard_frozen', False)
         )
         db.session.add(submission)
         db.session.commit()
         
-        # Judge the submission
-        try:
-            result = judge_submission(
-                code=data['code'].replace("<br>", "\n"),
-                language=data['language'],
-                batches=problem.batches,
-                time_limit=problem.time_limit,
-                memory_limit=problem.memory_limit
-            )
-            
-            # Update submission record
-            submission.status = result['status']
-            submission.execution_time = result.get('execution_time')
-            submission.memory_used = result.get('memory_used')
-            submission.points_earned = result.get('points_earned', 0)
-            submission.batch_results = result['batch_results']
-            result['id'] = count
-            
-            # Emit WebSocket event for new submission - update leaderboard
-            socketio.emit('update_leaderboard')
-            
-            db.session.commit()
-            return jsonify(result)
-            
-        except Exception as e:
-            print(f"Judge error: {str(e)}")
-            submission.status = 'ERROR'
-            db.session.commit()
-            return jsonify({'error': f'Judge error: {str(e)}'}), 500
+        # Identical code already judged on the same tests gets the same verdict without running it
+        db_start = time.perf_counter()
+        key = verdict_key(judge_payload(submission), 'submit')
+        cached = lookup_verdict(key, 'submit')
+        if cached is not None:
+            save_judge_result(submission, cached, 0, (time.perf_counter() - db_start) * 1000)
+            return jsonify({'id': submission.id, 'status': submission.status, 'message': 'Identical submission already judged'}), 200
+        
+        # Queue the submission, the verdict is pushed to the user once it is judged
+        queue_submission(submission)
+        
+        return jsonify({'id': submission.id, 'status': 'PENDING', 'message': 'Submission queued for judging'}), 202
             
     except Exception as e:
         print(f"Submission error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def record_judge_metrics(language, result):
+    """Feed the phase timings and verdicts of a judged submission into the metrics."""
+    timings = result['timings']
+    judge_phase_duration.observe(timings['compile'] / 1000, language=language, phase='compile')
+    for test in timings['tests']:
+        for phase, duration in test.items():
+            judge_phase_duration.observe(duration / 1000, language=language, phase=phase)
+    for batch in result['batch_results']:
+        for test_case in batch['test_case_results']:
+            if test_case['status'] != 'skip':
+                test_verdicts.inc(language=language, verdict=test_case['status'])
+
+def summarize_timings(result, queue_time, db_time):
+    """Per-phase breakdown of one submission in milliseconds, as stored on the row."""
+    timings = result['timings']
+    return {
+        'queue': round(queue_time, 2),
+        'compile': timings['compile'],
+        **{phase: round(sum(test[phase] for test in timings['tests']), 2) for phase in ('spawn', 'execute', 'compare')},
+        'judge': timings['total'],
+        'db': round(db_time, 2),
+        'tests': timings['tests']
+    }
+
+def judge_payload(submission):
+    """Everything needed to judge a submission, so it can be judged without the database."""
+    problem = submission.problem
+    return {
+        'code': submission.code.replace("<br>", "\n"),
+        'language': submission.language,
+        'batches': problem.batches,
+        'time_limit': problem.time_limit,
+        'memory_limit': problem.memory_limit,
+        'checker': problem.checker
+    }
+
+def validate_checker(checker):
+    """Return why a checker spec is unusable, or None."""
+    if checker is None:
+        return None
+    if not isinstance(checker, dict) or checker.get('type') not in ('exact', 'tokens', 'float', 'custom'):
+        return 'Checker type must be exact, tokens, float or custom'
+    if checker['type'] == 'float':
+        try:
+            if float(checker.get('abs_eps', 1e-6)) < 0 or float(checker.get('rel_eps', 1e-6)) < 0:
+                return 'Checker tolerances must not be negative'
+        except (TypeError, ValueError):
+            return 'Checker tolerances must be numbers'
+    if checker['type'] == 'custom':
+        _, error = compile_checker(checker)
+        if error is not None:
+            return f'Checker does not compile: {error}'
+    return None
+
+def verdict_key(payload, kind):
+    """Hash the normalized source, language, limits and test data of a judge payload into a verdict cache key."""
+    # Line endings and trailing blank lines never change a verdict
+    code = payload['code'].replace('\r\n', '\n').rstrip() + '\n'
+    h = hashlib.sha256()
+    for part in (kind, payload['language'], str(payload['time_limit']), str(payload['memory_limit']),
+                 json.dumps(payload['batches'], sort_keys=True), json.dumps(payload.get('checker'), sort_keys=True), code):
+        h.update(part.encode())
+        h.update(b'\0\0')
+    return h.hexdigest()
+
+def cacheable(result):
+    """Whether a judge result can be reused; time limit verdicts depend on machine load."""
+    return 'error' not in result and result.get('status') != 'ERROR' and not any(
+        test_case['status'] == 'TLE' for batch in result['batch_results'] for test_case in batch['test_case_results'])
+
+def lookup_verdict(key, kind):
+    """Return the cached result for a key, or None."""
+    if not app.config['VERDICT_CACHE']:
+        return None
+    entry = db.session.get(VerdictCache, key)
+    verdict_cache_lookups.inc(kind=kind, result='hit' if entry is not None else 'miss')
+    return dict(entry.result) if entry is not None else None
+
+def store_verdict(key, problem_id, result):
+    """Cache a judge result under its key, replacing an older entry."""
+    if not app.config['VERDICT_CACHE'] or not cacheable(result):
+        return
+    db.session.merge(VerdictCache(key=key, problem_id=problem_id, created_at=datetime.now(), result={
+        field: result.get(field) for field in ('status', 'points_earned', 'execution_time', 'memory_used', 'batch_results')
+    }))
+
+def invalidate_verdict_cache(problem_id):
+    """Drop the cached verdicts of a problem."""
+    VerdictCache.query.filter_by(problem_id=problem_id).delete()
+
+def set_problem_batches(problem, batches):
+    """Replace the batches of a problem; verdicts judged on the old tests no longer apply."""
+    problem.batches = batches
+    problem.total_points = sum(batch['points'] for batch in batches)
+    problem.version = Problem.version + 1
+    invalidate_verdict_cache(problem.id)
+
+def save_judge_result(submission, result, queue_time, db_time, cache_key=None):
+    """Store a judge result on its submission, update the standings and notify the submitter.
+
+    Results without 'timings' come from the verdict cache. Fresh results are
+    cached under `cache_key` when it is given.
+    """
+    try:
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        
+        # Update submission record
+        submission.status = result['status']
+        submission.execution_time = result.get('execution_time')
+        submission.memory_used = result.get('memory_used')
+        submission.points_earned = result.get('points_earned', 0)
+        submission.batch_results = result['batch_results']
+        db_start = time.perf_counter()
+        if submission.status == 'AC':
+            update_standing(submission)
+        db.session.add(ScoreEvent(**judged_event(submission)))
+        if cache_key is not None:
+            store_verdict(cache_key, submission.problem_id, result)
+        db.session.flush()
+        db_time += (time.perf_counter() - db_start) * 1000
+        if 'timings' in result:
+            submission.timings = summarize_timings(result, queue_time, db_time)
+        else:
+            submission.timings = {'cached': True, 'queue': round(queue_time, 2), 'db': round(db_time, 2)}
+        db.session.commit()
+        invalidate_leaderboard()
+        if 'timings' in result:
+            record_judge_metrics(submission.language, result)
+        
+    except Exception as e:
+        print(f"Judge error: {str(e)}")
+        db.session.rollback()
+        submission.status = 'ERROR'
+        db.session.commit()
+    submissions_judged.inc(language=submission.language, status=submission.status)
+    
+    # Notify the submitter, the leaderboard delta is pushed separately once the snapshot is rebuilt
+    emit_event('submission_judged', {
+        'id': submission.id,
+        'problem_id': submission.problem_id,
+        'status': submission.status,
+        'points_earned': submission.points_earned
+    }, to=f'user_{submission.user_id}')
+
+def judge_pending_submission(submission_id):
+    """Judge a queued submission in this process and push the verdict to the submitter."""
+    with app.app_context():
+        db_start = time.perf_counter()
+        submission = db.session.get(Submission, submission_id)
+        if submission is None or submission.status != 'PENDING':
+            return
+        payload = judge_payload(submission)
+        db_time = (time.perf_counter() - db_start) * 1000
+        queue_time = max(0.0, (contest_now() - submission.submitted_at).total_seconds() * 1000)
+        
+        try:
+            result = judge_submission(**dict(payload, batches=test_data.resolve_batches(payload['batches'])))
+        except Exception as e:
+            result = {'error': str(e)}
+        save_judge_result(submission, result, queue_time, db_time, cache_key=verdict_key(payload, 'submit'))
+
+# Contest submissions go first, then /run_code, then rejudges; users take turns within each class
+judge_pool = JudgePool(
+    workers=app.config['JUDGE_WORKERS'],
+    user_limit=app.config['JUDGE_USER_LIMIT'],
+    class_limits={PRIORITY_RUN: app.config['RUN_CODE_WORKERS']},
+    queue_limits={PRIORITY_RUN: app.config['RUN_CODE_QUEUE_LIMIT']},
+    user_queue_limits={PRIORITY_RUN: 1}
+)
+
+# Queue shared with `python -m judge.worker` processes when JUDGE_MODE is 'remote'
+with app.app_context():
+    job_queue = JobQueue(db.engine)
+result_poller = {'thread': None}
+result_poller_lock = threading.Lock()
+
+def apply_remote_results():
+    """Save the results that remote judge workers wrote back."""
+    with app.app_context():
+        for job in job_queue.finished():
+            # Claim the result first so only one web process saves it
+            if not job_queue.remove(job['id']):
+                continue
+            db_start = time.perf_counter()
+            submission = db.session.get(Submission, job['submission_id'])
+            if submission is None or submission.status != 'PENDING':
+                continue
+            db_time = (time.perf_counter() - db_start) * 1000
+            save_judge_result(submission, job['result'], job['result'].get('queue_time', 0), db_time,
+                              cache_key=verdict_key(job['payload'], 'submit'))
+
+def poll_remote_results():
+    while True:
+        try:
+            apply_remote_results()
+        except Exception as e:
+            print(f"Result poller error: {str(e)}")
+        time.sleep(app.config['JUDGE_RESULT_POLL_INTERVAL'])
+
+def start_result_poller():
+    """Start the thread that saves remote results if it is not running."""
+    with result_poller_lock:
+        if result_poller['thread'] is None:
+            thread = threading.Thread(target=poll_remote_results, name='judge-result-poller', daemon=True)
+            thread.start()
+            result_poller['thread'] = thread
+
+def queue_submission(submission, priority=PRIORITY_SUBMIT):
+    """Hand a pending submission to the local worker pool or to the remote workers."""
+    if app.config['JUDGE_MODE'] == 'remote':
+        start_result_poller()
+        job_queue.enqueue(submission.id, judge_payload(submission), priority=priority)
+    else:
+        judge_pool.submit(judge_pending_submission, submission.id, priority=priority, user=submission.user_id)
+
+def run_remote_job(payload):
+    """Run a /run_code payload on a remote judge worker and wait for its result."""
+    job_id = job_queue.enqueue(None, dict(payload, is_run_code=True), priority=PRIORITY_RUN)
+    deadline = time.monotonic() + app.config['RUN_CODE_TIMEOUT']
+    while time.monotonic() < deadline:
+        result = job_queue.take_result(job_id)
+        if result is not None:
+            if 'status' not in result:
+                raise RuntimeError(result.get('error', 'Judging failed'))
+            return result
+        time.sleep(app.config['JUDGE_RESULT_POLL_INTERVAL'])
+    job_queue.discard(job_id)
+    raise TimeoutError(f"No judge worker ran the code within {app.config['RUN_CODE_TIMEOUT']:g} seconds")
+
+def retry_hint(priority):
+    """Seconds a refused client should wait before trying again."""
+    if app.config['JUDGE_MODE'] == 'remote' and priority != PRIORITY_RUN:
+        stats = job_queue.stats()
+        return max(1, stats['queue_depth'] // max(1, stats['workers']))
+    return judge_pool.retry_after(priority)
+
+def too_many_requests(message, retry_after):
+    return jsonify({'error': message, 'retry_after': retry_after}), 429, {'Retry-After': str(retry_after)}
+
+def judge_stats():
+    """Return the worker count, busy workers and queue depth of the judges in use."""
+    if app.config['JUDGE_MODE'] == 'remote':
+        return job_queue.stats()
+    return dict(judge_pool.stats(), sandbox=sandbox_pool.stats())
+
+metrics.gauge('cms_judge_queue_depth', 'Submissions waiting for a judge worker.', lambda: judge_stats()['queue_depth'])
+metrics.gauge('cms_judge_busy_workers', 'Judge workers currently judging.', lambda: judge_stats()['busy'])
+metrics.gauge('cms_judge_workers', 'Judge workers (remote workers count while they hold a job).', lambda: judge_stats()['workers'])
+
+def recover_pending_submissions():
+    """Re-queue submissions that were still pending when the server stopped."""
+    with app.app_context():
+        pending = Submission.query.filter_by(status='PENDING').order_by(Submission.id).all()
+        for submission in pending:
+            queue_submission(submission)
+        if app.config['JUDGE_MODE'] == 'remote':
+            start_result_poller()  # Results may have been written back while the server was down
+
+@socketio.on('connect')
+def on_connect():
+    # Each user gets a private room so verdicts are only pushed to the submitter
+    if current_user.is_authenticated:
+        join_room(f'user_{current_user.id}')
+
 @app.route('/run_code', methods=['POST'])
 @login_required
 def run_code():
@@ -354,16 +1042,53 @@ def run_code():
         time_limit = data.get('time_limit', 1000)  # Default 1 second
         memory_limit = data.get('memory_limit', 256)  # Default 256MB
         
-        # Run the code
+        # Outputs are compared with the problem's checker when the run is for a problem
+        checker = None
+        if data.get('problem_id') is not None:
+            checker = Problem.query.get_or_404(data['problem_id']).checker
+        
+        payload = {
+            'code': data['code'].replace("<br>", "\n"),
+            'language': data['language'],
+            'batches': [batch],
+            'time_limit': time_limit,
+            'memory_limit': memory_limit,
+            'checker': checker
+        }
+        
+        # The same program on the same samples was already run
+        key = verdict_key(payload, 'run')
+        cached = lookup_verdict(key, 'run')
+        if cached is not None:
+            cached.pop('points_earned', None)
+            return jsonify(dict(cached, cached=True))
+        
+        # Run the code on the judge workers, behind contest submissions
+        if app.config['JUDGE_MODE'] == 'remote':
+            # Untrusted code stays off the web tier
+            get_result = partial(run_remote_job, payload)
+        else:
+            try:
+                job = judge_pool.submit(partial(judge_submission, **payload, is_run_code=True),
+                                        priority=PRIORITY_RUN, user=current_user.id)
+            except QueueFull as e:
+                return too_many_requests(str(e), e.retry_after)
+            get_result = job.result
         try:
-            result = judge_submission(
-                code=data['code'].replace("<br>", "\n"),
-                language=data['language'],
-                batches=[batch],
-                time_limit=time_limit,
-                memory_limit=memory_limit,
-                is_run_code=True  # Set this to True for run code submissions
-            )
+            result = get_result()
+            record_judge_metrics(data['language'], result)
+            
+            # Expire old entries as new ones come in, they are not tied to a problem
+            try:
+                store_verdict(key, None, result)
+                VerdictCache.query.filter(
+                    VerdictCache.problem_id.is_(None),
+                    VerdictCache.created_at < datetime.fromtimestamp(time.time() - app.config['VERDICT_CACHE_RUN_TTL'])
+                ).delete()
+                db.session.commit()
+            except Exception as e:
+                print(f"Verdict cache error: {str(e)}")
+                db.session.rollback()
             
             # Remove submission-specific fields
             result.pop('points_earned', None)
@@ -379,46 +1104,179 @@ def run_code():
         print(f"Run error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/leaderboard')
-@login_required
-def get_leaderboard():
-    # Get all users who are not admins
-    users = User.query.filter_by(is_admin=False).all()
+def update_standing(submission):
+    """Fold a judged submission into the standings table."""
+    def better(points, time):
+        # The submission wins with more points, or with equal points submitted earlier
+        return (points < submission.points_earned) | (
+            (points == submission.points_earned) & (time > submission.submitted_at))
     
-    # Get all problems
-    problems = Problem.query.order_by(Problem.id).all()
+    values = {'user_id': submission.user_id, 'problem_id': submission.problem_id}
     
-    # Get whether leaderboard is frozen
-    is_frozen = contest_config.get('leaderboard_frozen', False)
+    # Best over all submissions
+    stmt = sqlite_insert(Standing).values(**values, points=submission.points_earned, submission_time=submission.submitted_at)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id', 'problem_id'],
+        set_={'points': stmt.excluded.points, 'submission_time': stmt.excluded.submission_time},
+        where=better(Standing.points, Standing.submission_time)
+    ))
+    
+    # Best over the submissions that are visible while the leaderboard is frozen
+    if not submission.submitted_while_frozen:
+        stmt = sqlite_insert(Standing).values(**values, public_points=submission.points_earned, public_submission_time=submission.submitted_at)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id', 'problem_id'],
+            set_={'public_points': stmt.excluded.public_points, 'public_submission_time': stmt.excluded.public_submission_time},
+            where=better(Standing.public_points, Standing.public_submission_time)
+        ))
+
+def recompute_standing(user_id, problem_id):
+    """Recompute one standings row from the accepted submissions of a user on a problem."""
+    Standing.query.filter_by(user_id=user_id, problem_id=problem_id).delete()
+    db.session.add(ScoreEvent(kind='reset', user_id=user_id, problem_id=problem_id))
+    for submission in Submission.query.filter_by(user_id=user_id, problem_id=problem_id, status='AC').order_by(Submission.id).all():
+        update_standing(submission)
+        db.session.add(ScoreEvent(**judged_event(submission)))
+
+def rebuild_standings(log_events=True):
+    """Recompute the standings table from the Submission rows.
+
+    With log_events, the score event log restarts from the same submissions.
+    """
+    Standing.query.delete()
+    standings = {}
+    submissions = db.session.execute(
+        select(Submission.id, Submission.user_id, Submission.problem_id, Submission.points_earned,
+               Submission.submitted_at, Submission.submitted_while_frozen)
+        .where(Submission.status == 'AC')
+        .order_by(Submission.points_earned.desc(), Submission.submitted_at)
+    ).all()
+    if log_events:
+        now = contest_now()
+        db.session.add(ScoreEvent(kind='reset', created_at=now))
+        db.session.flush()
+        events = [{'kind': 'judged', 'submission_id': submission_id, 'user_id': user_id, 'problem_id': problem_id,
+                   'status': 'AC', 'points': points, 'submitted_at': submitted_at, 'frozen': frozen, 'created_at': now}
+                  for submission_id, user_id, problem_id, points, submitted_at, frozen in sorted(submissions)]
+        for start in range(0, len(events), 1000):
+            db.session.execute(insert(ScoreEvent), events[start:start + 1000])
+    for _, user_id, problem_id, points, submitted_at, frozen in submissions:
+        standing = standings.get((user_id, problem_id))
+        if standing is None:
+            # First row is the best submission overall
+            standing = standings[(user_id, problem_id)] = Standing(
+                user_id=user_id, problem_id=problem_id,
+                points=points, submission_time=submitted_at,
+                public_points=0, public_submission_time=None
+            )
+        if not frozen and standing.public_submission_time is None:
+            standing.public_points = points
+            standing.public_submission_time = submitted_at
+    db.session.add_all(standings.values())
+    db.session.commit()
+    invalidate_leaderboard()
+
+# Versioned leaderboard snapshot; changes are coalesced and pushed to clients as row deltas
+app.config['LEADERBOARD_COALESCE_WINDOW'] = float(os.environ.get('LEADERBOARD_COALESCE_WINDOW', 0.5))  # in seconds
+leaderboard_state = {
+    'snapshot': None,
+    'token': None,  # leaderboard_token() the snapshot was built from
+    'timer': None
+}
+leaderboard_lock = threading.Lock()
+leaderboard_publish_lock = threading.Lock()
+
+def invalidate_leaderboard():
+    """Schedule a rebuild of the leaderboard snapshot at the end of the coalescing window."""
+    with leaderboard_lock:
+        if leaderboard_state['timer'] is not None:
+            return
+        timer = threading.Timer(app.config['LEADERBOARD_COALESCE_WINDOW'], publish_leaderboard)
+        timer.daemon = True
+        leaderboard_state['timer'] = timer
+    timer.start()
+
+def leaderboard_token():
+    """Latest score event, user, problem and settings version, so changes made by other processes are noticed."""
+    return tuple(db.session.execute(select(
+        select(db.func.max(ScoreEvent.id)).scalar_subquery(),
+        select(db.func.max(User.id)).scalar_subquery(),
+        select(db.func.max(Problem.id)).scalar_subquery(),
+        select(ContestSettings.version).where(ContestSettings.id == 1).scalar_subquery()
+    )).one())
+
+def leaderboard_version(snapshot):
+    """Hash of the snapshot's content, so every web process gives the same standings the same version."""
+    return hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode()).hexdigest()[:16]
+
+def publish_leaderboard(notify=True):
+    """Rebuild the leaderboard snapshot and push the rows that changed to every client.
+
+    With `notify` False the snapshot is only rebuilt, for changes made by
+    another process, which notifies the clients itself.
+    """
+    with leaderboard_publish_lock:
+        with leaderboard_lock:
+            leaderboard_state['timer'] = None
+        with app.app_context():
+            refresh_contest_config()
+            token = leaderboard_token()
+            snapshot = build_leaderboard(contest_config.get('leaderboard_frozen', False))
+            try:
+                checkpoint_standings()
+            except Exception as e:
+                print(f"Standings checkpoint error: {str(e)}")
+                db.session.rollback()
+        
+        previous = leaderboard_state['snapshot']
+        if previous is None or previous['problems'] != snapshot['problems'] or previous['is_frozen'] != snapshot['is_frozen']:
+            changed = None  # Clients must refetch the whole table
+        else:
+            # Ranks are derived from totals, so they are left out of the comparison
+            def strip_rank(row):
+                return {k: v for k, v in row.items() if k != 'rank'}
+            old_rows = {row['user_id']: strip_rank(row) for row in previous['users']}
+            changed = [row for row in snapshot['users'] if old_rows.get(row['user_id']) != strip_rank(row)]
+            if not changed and len(old_rows) == len(snapshot['users']):
+                leaderboard_state['token'] = token
+                return previous
+        
+        snapshot['version'] = leaderboard_version(snapshot)
+        with leaderboard_lock:
+            leaderboard_state['snapshot'] = snapshot
+            leaderboard_state['token'] = token
+        
+        if notify:
+            delta = {'version': snapshot['version'], 'base_version': previous['version'] if previous is not None else None}
+            if changed is None:
+                delta['resync'] = True
+            else:
+                delta['users'] = changed
+            emit_event('leaderboard_delta', delta)
+        return snapshot
+
+def build_leaderboard(is_frozen):
+    """Build the leaderboard from the standings table with a single read per table."""
+    users = User.query.filter_by(is_admin=False).order_by(User.id).all()
+    problems = Problem.query.options(load_only(Problem.id, Problem.title, Problem.shortname)).order_by(Problem.id).all()
+    standings = {(s.user_id, s.problem_id): s for s in Standing.query.all()}
     
-    # Calculate points for each user
     leaderboard_data = []
     for user in users:
         user_data = {
+            'user_id': user.id,
             'username': user.username,
             'total_points': 0,
             'problem_points': []
         }
-        
-        # For each problem, find the best submission
         for problem in problems:
-            best_submission = Submission.query.filter_by(
-                user_id=user.id,
-                problem_id=problem.id,
-                status='AC'
-            )
-            if is_frozen: # Frozen leaderboard - filter out submissions made while frozen
-                best_submission = best_submission.filter_by(
-                    submitted_while_frozen=False
-                )
-            best_submission = best_submission.order_by(Submission.points_earned.desc()).order_by(Submission.submitted_at).first()
-            
-            # If leaderboard was not frozen when this submission was counted, count this submission for all subsequent displays of the leaderboard
-            if not is_frozen and best_submission:
-                best_submission.submitted_while_frozen = False
-            
-            points = best_submission.points_earned if best_submission else 0
-            submission_time = best_submission.submitted_at if best_submission else None
+            standing = standings.get((user.id, problem.id))
+            if standing is None:
+                points, submission_time = 0, None
+            elif is_frozen:
+                points, submission_time = standing.public_points, standing.public_submission_time
+            else:
+                points, submission_time = standing.points, standing.submission_time
             
             user_data['problem_points'].append({
                 'points': points,
@@ -429,20 +1287,245 @@ def get_leaderboard():
         # Add user to leaderboard even if they have no submissions
         leaderboard_data.append(user_data)
     
-    # Sort by total points in descending order
-    leaderboard_data.sort(key=lambda x: x['total_points'], reverse=True)
+    rank_rows(leaderboard_data)
     
-    db.session.commit()
-    return jsonify({
+    return {
         'problems': [{'id': p.id, 'title': p.title, 'shortname': p.shortname} for p in problems],
         'users': leaderboard_data,
-        'is_frozen': contest_config.get('leaderboard_frozen', False)
+        'is_frozen': is_frozen
+    }
+
+def get_leaderboard_snapshot():
+    """Return the current leaderboard snapshot, building the first one if needed."""
+    snapshot = leaderboard_state['snapshot']
+    if snapshot is None:
+        snapshot = publish_leaderboard()
+    elif leaderboard_state['timer'] is None and leaderboard_state['token'] != leaderboard_token():
+        # Changed by another web process; a pending rebuild of our own would cover it
+        snapshot = publish_leaderboard(notify=False)
+    return snapshot
+
+@app.route('/leaderboard')
+@login_required
+def get_leaderboard():
+    snapshot = get_leaderboard_snapshot()
+    return cached_response('leaderboard', snapshot['version'], lambda: json.dumps(snapshot))
+
+def judged_event(submission):
+    """Score event values recording the verdict of a submission."""
+    return {
+        'kind': 'judged',
+        'submission_id': submission.id,
+        'user_id': submission.user_id,
+        'problem_id': submission.problem_id,
+        'status': submission.status,
+        'points': submission.points_earned,
+        'submitted_at': submission.submitted_at,
+        'frozen': submission.submitted_while_frozen
+    }
+
+SCORE_EVENT_COLUMNS = (ScoreEvent.kind, ScoreEvent.user_id, ScoreEvent.problem_id, ScoreEvent.status,
+                       ScoreEvent.points, ScoreEvent.submitted_at, ScoreEvent.frozen)
+
+def standings_state(event_id):
+    """Fold the score events up to `event_id`, starting from the nearest checkpoint before it."""
+    checkpoint = db.session.execute(
+        select(StandingsCheckpoint.event_id, StandingsCheckpoint.state).where(StandingsCheckpoint.event_id <= event_id)
+        .order_by(StandingsCheckpoint.event_id.desc()).limit(1)
+    ).first()
+    start, state = checkpoint if checkpoint is not None else (0, empty_state())
+    events = db.session.execute(
+        select(*SCORE_EVENT_COLUMNS).where(ScoreEvent.id > start, ScoreEvent.id <= event_id).order_by(ScoreEvent.id)
+        .execution_options(yield_per=1000)
+    )
+    for event in events:
+        apply_event(state, event._mapping)
+    return state
+
+def last_event_id(before=None):
+    """Id of the last score event, or of the last one created at or before `before`; 0 for none."""
+    stmt = select(db.func.max(ScoreEvent.id))
+    if before is not None:
+        stmt = stmt.where(ScoreEvent.created_at <= before)
+    return db.session.execute(stmt).scalar() or 0
+
+def checkpoint_standings():
+    """Store the folded standings once enough events have been logged since the last checkpoint."""
+    event_id = last_event_id()
+    checkpointed = db.session.execute(select(db.func.max(StandingsCheckpoint.event_id))).scalar() or 0
+    if event_id - checkpointed >= app.config['STANDINGS_CHECKPOINT_INTERVAL']:
+        db.session.add(StandingsCheckpoint(event_id=event_id, state=standings_state(event_id)))
+        db.session.commit()
+
+def board_entities():
+    """Contestants as (id, username) pairs and problems in leaderboard order."""
+    users = db.session.execute(select(User.id, User.username).where(User.is_admin == False).order_by(User.id)).all()
+    problems = db.session.execute(select(Problem.id, Problem.title, Problem.shortname).order_by(Problem.id)).all()
+    return [tuple(user) for user in users], [dict(problem._mapping) for problem in problems]
+
+def parse_contest_time(value):
+    """Parse an ISO timestamp given in contest time; None when missing, ValueError when malformed."""
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(pytz.timezone(contest_config.get('time_zone', 'UTC'))).replace(tzinfo=None)
+    return moment
+
+@app.route('/leaderboard/history')
+@login_required
+def get_leaderboard_history():
+    """The leaderboard as it stood at `at` (contest time, default now).
+
+    Contestants get the view that was shown then, frozen or live; admins may
+    ask for either with `view`.
+    """
+    try:
+        at = parse_contest_time(request.args.get('at'))
+    except ValueError:
+        return jsonify({'error': 'at must be an ISO timestamp'}), 400
+    view = request.args.get('view')
+    if view not in (None, 'live', 'frozen'):
+        return jsonify({'error': "view must be 'live' or 'frozen'"}), 400
+    if view is not None and not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    event_id = last_event_id(at)
+    state = standings_state(event_id)
+    is_frozen = state['frozen'] if view is None else view == 'frozen'
+    users, problems = board_entities()
+    result = board(state, users, problems, is_frozen)
+    result['at'] = (at or contest_now()).isoformat(timespec='seconds')
+    result['event_id'] = event_id
+    return jsonify(result)
+
+@app.route('/leaderboard/reveal')
+@login_required
+def get_leaderboard_reveal():
+    """The frozen leaderboard and the steps that reveal the hidden results one at a time.
+
+    Uses the standings at `at` if given, otherwise the current ones while
+    frozen, or those just before the unfreeze that ended the last freeze.
+    """
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    try:
+        at = parse_contest_time(request.args.get('at'))
+    except ValueError:
+        return jsonify({'error': 'at must be an ISO timestamp'}), 400
+    
+    if at is not None:
+        event_id = last_event_id(at)
+    elif contest_config.get('leaderboard_frozen', False):
+        event_id = last_event_id()
+    else:
+        # The unfreeze that ended the last freeze
+        freeze_id = db.session.execute(
+            select(db.func.max(ScoreEvent.id)).where(ScoreEvent.kind == 'freeze')
+        ).scalar()
+        unfreeze_id = db.session.execute(
+            select(db.func.min(ScoreEvent.id)).where(ScoreEvent.kind == 'unfreeze', ScoreEvent.id > freeze_id)
+        ).scalar() if freeze_id is not None else None
+        if unfreeze_id is None:
+            return jsonify({'error': 'The leaderboard has not been frozen'}), 400
+        event_id = unfreeze_id - 1
+    
+    state = standings_state(event_id)
+    if not state['frozen']:
+        return jsonify({'error': 'The leaderboard was not frozen at that time'}), 400
+    users, problems = board_entities()
+    return jsonify({
+        'event_id': event_id,
+        'leaderboard': board(state, users, problems, True),
+        'steps': reveal_steps(state, users, problems)
     })
 
+@app.route('/rebuild_standings', methods=['POST'])
+@login_required
+def rebuild_standings_route():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    rebuild_standings()
+    return jsonify({'message': 'Standings rebuilt successfully'})
+
+@app.route('/submission/<int:submission_id>/rejudge', methods=['POST'])
+@login_required
+def rejudge_submission(submission_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    submission = Submission.query.get_or_404(submission_id)
+    if submission.status == 'PENDING':
+        return jsonify({'error': 'Submission is already being judged'}), 400
+    
+    # Judge it again for real, the new verdict replaces the cached one
+    VerdictCache.query.filter_by(key=verdict_key(judge_payload(submission), 'submit')).delete()
+    submission.status = 'PENDING'
+    recompute_standing(submission.user_id, submission.problem_id)
+    db.session.commit()
+    invalidate_leaderboard()
+    queue_submission(submission, priority=PRIORITY_REJUDGE)
+    return jsonify({'id': submission.id, 'status': 'PENDING', 'message': 'Submission queued for rejudging'}), 202
+
+@app.route('/problem/<int:problem_id>/rejudge', methods=['POST'])
+@login_required
+def rejudge_problem(problem_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    problem = Problem.query.get_or_404(problem_id)
+    submissions = Submission.query.filter(Submission.problem_id == problem.id, Submission.status != 'PENDING').order_by(Submission.id).all()
+    invalidate_verdict_cache(problem.id)
+    for submission in submissions:
+        submission.status = 'PENDING'
+    Standing.query.filter_by(problem_id=problem.id).delete()
+    db.session.add(ScoreEvent(kind='reset', problem_id=problem.id))
+    db.session.commit()
+    invalidate_leaderboard()
+    for submission in submissions:
+        queue_submission(submission, priority=PRIORITY_REJUDGE)
+    return jsonify({'message': f'{len(submissions)} submissions queued for rejudging'}), 202
+
+@app.cli.command('rebuild-standings')
+def rebuild_standings_command():
+    """Rebuild the standings table from all submissions."""
+    rebuild_standings()
+    print("Standings rebuilt successfully")
+
+@app.cli.command('import-problem')
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--problem-id', type=int, help='Replace this problem instead of creating a new one.')
+def import_problem_command(path, problem_id):
+    """Import a problem package from a zip file or directory."""
+    problem = None
+    if problem_id is not None:
+        problem = db.session.get(Problem, problem_id)
+        if problem is None:
+            raise click.ClickException(f'No problem with id {problem_id}')
+    try:
+        problem = import_problem_package(path, problem)
+    except PackageError as e:
+        raise click.ClickException(str(e))
+    tests = sum(len(batch['test_cases']) for batch in problem.batches)
+    print(f"Imported problem {problem.id} ({problem.shortname}) with {len(problem.batches)} batches and {tests} tests")
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Create missing tables and apply pending schema migrations."""
+    migrate_database()
+    print("Database is up to date")
+
 @app.route('/submission/<int:submission_id>')
 @login_required
 def get_submission(submission_id):
-    submission = Submission.query.filter_by(user_id=current_user.id, id=submission_id).first()
+    row = db.session.execute(
+        select(Submission, Problem.title, Problem.total_points)
+        .join(Problem, Submission.problem_id == Problem.id)
+        .where(Submission.user_id == current_user.id, Submission.id == submission_id)
+    ).first()
+    if row is None:
+        return jsonify({'error': 'Submission not found'}), 404
+    submission, title, total_points = row
     return jsonify({
         'id': submission.id,
         'user_id': submission.user_id,
@@ -451,8 +1534,8 @@ def get_submission(submission_id):
         'submitted_at': submission.submitted_at.isoformat(),
         'points_earned': submission.points_earned,
         'problem': {
-            'title': submission.problem.title,
-            'total_points': sum(batch['points'] for batch in submission.problem.batches)
+            'title': title,
+            'total_points': total_points
         },
         'code': submission.code
     })
@@ -460,20 +1543,40 @@ def get_submission(submission_id):
 @app.route('/submissions')
 @login_required
 def get_submissions():
-    submissions = Submission.query.filter_by(user_id=current_user.id).order_by(Submission.id).all()
-    return jsonify([{
-        'id': s.id,
-        'problem': {
-            'title': s.problem.title,
-            'total_points': sum(batch['points'] for batch in s.problem.batches)
-        },
-        'language': s.language,
-        'status': s.status,
-        'execution_time': s.execution_time,
-        'memory_used': s.memory_used,
-        'points_earned': s.points_earned,
-        'submitted_at': s.submitted_at.isoformat()
-    } for s in submissions])
+    """Newest submissions of the user first, `limit` at a time; pass `next_before` back as `before` for the next page."""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    before = request.args.get('before', type=int)
+    
+    # Code and batch results stay in the database, the list only needs the summary columns
+    stmt = (
+        select(Submission.id, Submission.language, Submission.status, Submission.execution_time,
+               Submission.memory_used, Submission.points_earned, Submission.submitted_at,
+               Problem.title, Problem.total_points)
+        .join(Problem, Submission.problem_id == Problem.id)
+        .where(Submission.user_id == current_user.id)
+        .order_by(Submission.id.desc())
+        .limit(limit + 1)
+    )
+    if before is not None:
+        stmt = stmt.where(Submission.id < before)
+    rows = db.session.execute(stmt).all()
+    
+    return jsonify({
+        'submissions': [{
+            'id': row.id,
+            'problem': {
+                'title': row.title,
+                'total_points': row.total_points
+            },
+            'language': row.language,
+            'status': row.status,
+            'execution_time': row.execution_time,
+            'memory_used': row.memory_used,
+            'points_earned': row.points_earned,
+            'submitted_at': row.submitted_at.isoformat()
+        } for row in rows[:limit]],
+        'next_before': rows[limit - 1].id if len(rows) > limit else None
+    })
 
 @app.route('/check_admin')
 @login_required
@@ -487,6 +1590,31 @@ def problem_creation():
         return jsonify({'error': 'Unauthorized'}), 403
     return render_template('problem_creation.html')
 
+@app.route('/judge_status')
+@login_required
+def get_judge_status():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(judge_stats())
+
+@app.route('/metrics')
+def get_metrics():
+    # Scrapers authenticate with METRICS_TOKEN, people with an admin session
+    token = app.config['METRICS_TOKEN']
+    if not (token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')):
+        if not current_user.is_authenticated or not current_user.is_admin:
+            return jsonify({'error': 'Unauthorized'}), 403
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/submission/<int:submission_id>/timings')
+@login_required
+def get_submission_timings(submission_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    submission = db.get_or_404(Submission, submission_id)
+    return jsonify({'id': submission.id, 'language': submission.language, 'status': submission.status,
+                    'timings': submission.timings})
+
 @app.route('/contest_settings')
 @login_required
 def get_contest_settings():
@@ -504,42 +1632,182 @@ def update_contest_settings():
     if 'contest_name' not in data:
         return jsonify({'error': 'Contest name is required'}), 400
     
-    contest_config['contest_name'] = data['contest_name']
+    changes = {'contest_name': data['contest_name']}
+    for key in ('leaderboard_frozen', 'submissions_stopped'):
+        if key in data:
+            changes[key] = data[key]
+    previous, config, version = change_contest_config(changes)
     
-    # Handle leaderboard freeze
-    if 'leaderboard_frozen' in data:
-        contest_config['leaderboard_frozen'] = data['leaderboard_frozen']
-        if contest_config['leaderboard_frozen']:
-            socketio.emit('update_leaderboard', 'Leaderboard has been frozen. The displayed leaderboard may not reflect the most recent standings.')
-        else:
-            socketio.emit('update_leaderboard', 'Leaderboard has been unfrozen.')
-    
-    # Handle submissions stopped
-    if 'submissions_stopped' in data:
-        contest_config['submissions_stopped'] = data['submissions_stopped']
+    # The settings form always sends leaderboard_frozen; only a change freezes or unfreezes
+    frozen_changed = 'leaderboard_frozen' in changes and \
+        bool(changes['leaderboard_frozen']) != bool(previous.get('leaderboard_frozen', False))
+    if frozen_changed:
+        db.session.add(ScoreEvent(kind='freeze' if changes['leaderboard_frozen'] else 'unfreeze'))
+        if not changes['leaderboard_frozen']:
+            # Submissions made while frozen count for every later view, frozen or not
+            Submission.query.filter_by(submitted_while_frozen=True).update({'submitted_while_frozen': False})
+            Standing.query.update({
+                'public_points': Standing.points,
+                'public_submission_time': Standing.submission_time
+            })
+    db.session.commit()
+    set_contest_config(config, version)
     
-    # Save to config file
-    with open('config/contest_config.json', 'w') as f:
-        json.dump(contest_config, f, indent=4)
+    if frozen_changed:
+        invalidate_leaderboard()
+        if changes['leaderboard_frozen']:
+            emit_event('update_leaderboard', 'Leaderboard has been frozen. The displayed leaderboard may not reflect the most recent standings.')
+        else:
+            emit_event('update_leaderboard', 'Leaderboard has been unfrozen.')
     
     return jsonify({'message': 'Settings updated successfully'})
 
+def create_missing_indexes():
+    """Add indexes declared on the models to tables created before them."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+def store_inline_test_data():
+    """Move test cases still stored inline in Problem.batches into the test data store."""
+    # Columns added by later migrations do not exist yet
+    for problem in Problem.query.options(load_only(Problem.id, Problem.batches)).all():
+        if any('input' in test_case for batch in problem.batches for test_case in batch['test_cases']):
+            # Not set_problem_batches(), Problem.total_points does not exist yet either
+            problem.batches = [{
+                **batch,
+                'test_cases': [test_data.store_test_case(test_case) if 'input' in test_case else test_case
+                               for test_case in batch['test_cases']]
+            } for batch in problem.batches]
+            invalidate_verdict_cache(problem.id)
+    db.session.commit()
+
+def add_submission_timings():
+    """Add the Submission.timings column."""
+    columns = [column['name'] for column in inspect(db.engine).get_columns(Submission.__tablename__)]
+    if 'timings' not in columns:
+        db.session.execute(text('ALTER TABLE submission ADD COLUMN timings JSON'))
+        db.session.commit()
+
+def add_problem_checker():
+    """Add the Problem.checker column."""
+    columns = [column['name'] for column in inspect(db.engine).get_columns(Problem.__tablename__)]
+    if 'checker' not in columns:
+        db.session.execute(text('ALTER TABLE problem ADD COLUMN checker JSON'))
+        db.session.commit()
+
+def add_problem_total_points():
+    """Add the Problem.total_points column and fill it from the batches."""
+    columns = [column['name'] for column in inspect(db.engine).get_columns(Problem.__tablename__)]
+    if 'total_points' not in columns:
+        db.session.execute(text('ALTER TABLE problem ADD COLUMN total_points INTEGER NOT NULL DEFAULT 0'))
+    for problem in Problem.query.options(load_only(Problem.id, Problem.batches, Problem.total_points)).all():
+        problem.total_points = sum(batch['points'] for batch in problem.batches)
+    db.session.commit()
+
+def add_problem_version():
+    """Add the Problem.version column."""
+    columns = [column['name'] for column in inspect(db.engine).get_columns(Problem.__tablename__)]
+    if 'version' not in columns:
+        db.session.execute(text('ALTER TABLE problem ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+        db.session.commit()
+
+def fill_standings():
+    """Fill the standings table; the event log is seeded from the submissions by seed_score_events."""
+    rebuild_standings(log_events=False)
+
+def seed_score_events():
+    """Start the score event log from the submissions judged so far."""
+    if db.session.execute(select(ScoreEvent.id).limit(1)).first() is not None:
+        return
+    submissions = db.session.execute(
+        select(Submission.id, Submission.user_id, Submission.problem_id, Submission.status,
+               Submission.points_earned, Submission.submitted_at, Submission.submitted_while_frozen)
+        .where(Submission.status != 'PENDING')
+        .order_by(Submission.submitted_at, Submission.id)
+    )
+    # Earlier freezes left no trace, only the current one is known
+    frozen = contest_config.get('leaderboard_frozen', False)
+    events = []
+    for submission_id, user_id, problem_id, status, points, submitted_at, while_frozen in submissions:
+        if frozen and while_frozen:
+            events.append({'kind': 'freeze', 'created_at': submitted_at})
+            frozen = False
+        events.append({'kind': 'judged', 'submission_id': submission_id, 'user_id': user_id, 'problem_id': problem_id,
+                       'status': status, 'points': points, 'submitted_at': submitted_at, 'frozen': while_frozen,
+                       'created_at': submitted_at})
+    if frozen:
+        events.append({'kind': 'freeze', 'created_at': contest_now()})
+    for start in range(0, len(events), 1000):
+        db.session.execute(insert(ScoreEvent), events[start:start + 1000])
+    db.session.commit()
+
+def allow_run_jobs():
+    """Rebuild judge_job with a nullable submission_id, for /run_code jobs."""
+    columns = {column['name']: column for column in inspect(db.engine).get_columns('judge_job')}
+    if columns['submission_id']['nullable']:
+        return
+    # SQLite cannot drop NOT NULL in place; queued jobs are copied over
+    db.session.execute(text('DROP INDEX IF EXISTS ix_judge_job_status_lease'))
+    db.session.execute(text('ALTER TABLE judge_job RENAME TO judge_job_old'))
+    db.session.commit()
+    job_queue.create_table()
+    names = ', '.join(columns)
+    db.session.execute(text(f'INSERT INTO judge_job ({names}) SELECT {names} FROM judge_job_old'))
+    db.session.execute(text('DROP TABLE judge_job_old'))
+    db.session.commit()
+
+def add_job_priority():
+    """Add the judge_job.priority column."""
+    columns = [column['name'] for column in inspect(db.engine).get_columns('judge_job')]
+    if 'priority' not in columns:
+        db.session.execute(text('ALTER TABLE judge_job ADD COLUMN priority INTEGER NOT NULL DEFAULT 0'))
+        db.session.commit()
+
+# Applied in order to existing databases; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    create_missing_indexes,
+    store_inline_test_data,
+    fill_standings,
+    add_submission_timings,
+    add_job_priority,
+    add_problem_checker,
+    add_problem_total_points,
+    create_missing_indexes,  # Again, for ix_submission_user_id
+    seed_score_events,
+    add_problem_version,
+    allow_run_jobs
+]
+
+def migrate_database():
+    """Bring the database up to date without dropping any data."""
+    is_new = not inspect(db.engine).has_table(User.__tablename__)
+    db.create_all()
+    job_queue.create_table()
+    if socketio_queue is not None:
+        socketio_queue.create_table()
+    # A fresh database already has the latest schema
+    if not is_new:
+        version = db.session.execute(text('PRAGMA user_version')).scalar()
+        for migration in MIGRATIONS[version:]:
+            print(f"Applying migration: {migration.__name__}")
+            migration()
+    db.session.execute(text(f'PRAGMA user_version = {len(MIGRATIONS)}'))
+    # The settings file only seeds the shared settings, later changes are made in the database
+    if db.session.get(ContestSettings, 1) is None:
+        db.session.add(ContestSettings(id=1, data=dict({'leaderboard_frozen': False}, **load_contest_config()), version=1))
+    db.session.commit()
+    refresh_contest_config()
+
 if __name__ == '__main__':
     with app.app_context():
-        db.drop_all()
-        db.create_all()
+        migrate_database()
         
         # Initialize admin user
         init_admin()
         
-        # Initialize contest config if it doesn't exist
-        if not os.path.exists('config/contest_config.json'):
-            os.makedirs('config', exist_ok=True)
-            with open('config/contest_config.json', 'w') as f:
-                json.dump({
-                    'contest_name': 'Coding Contest',
-                    'leaderboard_frozen': False
-                }, f, indent=4)
+        # Re-queue any submissions left pending by a previous run
+        recover_pending_submissions()
     
     # Run the server on all network interfaces (0.0.0.0) and port 5000
     socketio.run(app, host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
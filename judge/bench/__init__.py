@@ -0,0 +1,201 @@
+"""Throughput benchmark for the judge.
+
+Judges every reference solution in the corpus through `judge_submission` and
+reports submissions per second and latency percentiles for the compile, spawn,
+execute and compare phases, per language, as JSON.
+
+The corpus has one directory per problem holding `problem.json` (limits and
+batches of test names), `tests/<name>.in` / `tests/<name>.out`, and
+`solutions/<verdict>.<ext>` where the verdict is the one the solution must get
+(ac, wa, tle, mle or re).
+
+Run it with `python -m judge.bench --help`.
+"""
+import json
+import os
+import platform
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from judge import judge
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+LANGUAGES = {
+    '.cpp': 'cpp',
+    '.java': 'java',
+    '.py': 'python'
+}
+
+# Tools a language needs on this machine, languages without them are skipped
+TOOLCHAINS = {
+    'cpp': ['g++'],
+    'java': ['javac', 'java'],
+    'python': ['python']
+}
+
+PHASES = ['compile', 'spawn', 'execute', 'compare']
+
+
+def load_corpus(corpus_dir: str) -> List[Dict[str, Any]]:
+    """Load every problem and its reference solutions from the corpus."""
+    problems = []
+    for name in sorted(os.listdir(corpus_dir)):
+        problem_dir = os.path.join(corpus_dir, name)
+        if not os.path.isfile(os.path.join(problem_dir, 'problem.json')):
+            continue
+        with open(os.path.join(problem_dir, 'problem.json')) as f:
+            problem = json.load(f)
+
+        tests_dir = os.path.join(problem_dir, 'tests')
+        problem['name'] = name
+        problem['batches'] = [{
+            'points': batch['points'],
+            'test_cases': [{
+                'input_path': os.path.join(tests_dir, f'{test}.in'),
+                'output_path': os.path.join(tests_dir, f'{test}.out')
+            } for test in batch['test_cases']]
+        } for batch in problem['batches']]
+
+        problem['solutions'] = []
+        solutions_dir = os.path.join(problem_dir, 'solutions')
+        for file_name in sorted(os.listdir(solutions_dir)):
+            verdict, ext = os.path.splitext(file_name)
+            if ext not in LANGUAGES:
+                continue
+            with open(os.path.join(solutions_dir, file_name)) as f:
+                code = f.read()
+            problem['solutions'].append({
+                'file': file_name,
+                'language': LANGUAGES[ext],
+                'expected': verdict.upper(),
+                'code': code
+            })
+        problems.append(problem)
+    return problems
+
+
+def available_languages() -> List[str]:
+    return [language for language, tools in TOOLCHAINS.items() if all(shutil.which(tool) for tool in tools)]
+
+
+def make_cold(code: str, language: str) -> str:
+    """Add a unique comment so the source misses the compile cache."""
+    comment = '#' if language == 'python' else '//'
+    return f'{code}\n{comment} bench {uuid.uuid4().hex}\n'
+
+
+def observed_verdict(result: Dict[str, Any]) -> str:
+    """The status of the first failing batch, or AC."""
+    for batch in result['batch_results']:
+        if batch['status'] != 'AC':
+            return batch['status']
+    return 'AC'
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """Nearest-rank percentiles of a list of milliseconds."""
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def rank(p):
+        return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 3),
+        'p50': round(rank(50), 3),
+        'p95': round(rank(95), 3),
+        'p99': round(rank(99), 3),
+        'max': round(values[-1], 3)
+    }
+
+
+def judge_one(problem, solution, cold, parallelism) -> Dict[str, Any]:
+    """Judge one solution and keep what the report needs."""
+    code = make_cold(solution['code'], solution['language']) if cold else solution['code']
+    start_time = time.monotonic()
+    result = judge.judge_submission(code, solution['language'], problem['batches'],
+                                    problem['time_limit'], problem['memory_limit'], parallelism=parallelism)
+    return {
+        'problem': problem['name'],
+        'file': solution['file'],
+        'language': solution['language'],
+        'expected': solution['expected'],
+        'verdict': observed_verdict(result),
+        'latency': (time.monotonic() - start_time) * 1000,
+        'timings': result['timings']
+    }
+
+
+def summarize(runs: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """Submissions per second and phase percentiles for a group of runs."""
+    phases = {phase: [] for phase in PHASES}
+    for run in runs:
+        phases['compile'].append(run['timings']['compile'])
+        for test in run['timings']['tests']:
+            for phase in ('spawn', 'execute', 'compare'):
+                phases[phase].append(test[phase])
+    return {
+        'submissions': len(runs),
+        'submissions_per_sec': round(len(runs) / wall_time, 3) if wall_time else None,
+        'submission_latency': percentiles([run['latency'] for run in runs]),
+        'phases': {phase: percentiles(values) for phase, values in phases.items()}
+    }
+
+
+def run_benchmark(corpus_dir=CORPUS_DIR, languages=None, rounds=5, workers=4, parallelism=1,
+                  cold=False, warmup=True) -> Dict[str, Any]:
+    """Judge the whole corpus `rounds` times with `workers` submissions in flight and return the report."""
+    problems = load_corpus(corpus_dir)
+    installed = available_languages()
+    languages = [language for language in (languages or list(TOOLCHAINS)) if language in installed]
+    jobs = [(problem, solution) for problem in problems for solution in problem['solutions']
+            if solution['language'] in languages]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if warmup and not cold:
+            # Fills the compile cache and starts the Python forkserver
+            list(executor.map(lambda job: judge_one(*job, cold, parallelism), jobs))
+
+        start_time = time.monotonic()
+        runs = list(executor.map(lambda job: judge_one(*job, cold, parallelism), jobs * rounds))
+        wall_time = time.monotonic() - start_time
+
+    report = {
+        'config': {
+            'rounds': rounds,
+            'workers': workers,
+            'parallelism': parallelism,
+            'cold_compile': cold,
+            'python_mode': judge.PYTHON_MODE,
+            'cgroups': judge.USE_CGROUPS,
+            'languages': languages,
+            'skipped_languages': [language for language in TOOLCHAINS if language not in languages]
+        },
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count()
+        },
+        'wall_time': round(wall_time, 3),
+        'overall': summarize(runs, wall_time),
+        'languages': {},
+        # Reference solutions that got another verdict than their file name says
+        'mismatches': [
+            {'problem': problem, 'file': file_name, 'verdict': verdict}
+            for problem, file_name, verdict in sorted({
+                (run['problem'], run['file'], run['verdict']) for run in runs if run['verdict'] != run['expected']
+            })
+        ]
+    }
+    # Per-language rates use the wall time the language would need alone at the same concurrency
+    for language in languages:
+        language_runs = [run for run in runs if run['language'] == language]
+        busy_time = sum(run['latency'] for run in language_runs) / 1000 / workers
+        report['languages'][language] = summarize(language_runs, busy_time)
+    return report
@@ -0,0 +1,32 @@
+import argparse
+import json
+import sys
+
+from judge.bench import CORPUS_DIR, TOOLCHAINS, run_benchmark
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m judge.bench', description='Benchmark judge throughput.')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='corpus directory (default: the bundled corpus)')
+    parser.add_argument('--languages', default=','.join(TOOLCHAINS), help='comma separated languages to run')
+    parser.add_argument('--rounds', type=int, default=5, help='times every solution is judged')
+    parser.add_argument('--workers', type=int, default=4, help='submissions judged at the same time')
+    parser.add_argument('--parallelism', type=int, default=1, help='test cases run at the same time per submission')
+    parser.add_argument('--cold', action='store_true', help='make every submission miss the compile cache')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.corpus, args.languages.split(','), args.rounds, args.workers,
+                           args.parallelism, args.cold)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    # Non-zero when a reference solution got the wrong verdict
+    return 1 if report['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+import java.io.*;
+import java.util.*;
+
+public class Solution {
+    public static void main(String[] args) throws IOException {
+        StreamTokenizer in = new StreamTokenizer(new BufferedReader(new InputStreamReader(System.in)));
+        in.nextToken();
+        int n = (int) in.nval;
+        long[] a = new long[n];
+        for (int i = 0; i < n; i++) {
+            in.nextToken();
+            a[i] = (long) in.nval;
+        }
+        Arrays.sort(a);
+        StringBuilder out = new StringBuilder();
+        for (int i = 0; i < n; i++) {
+            out.append(a[i]).append(i + 1 < n ? ' ' : '\n');
+        }
+        System.out.print(out);
+    }
+}
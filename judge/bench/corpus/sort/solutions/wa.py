@@ -0,0 +1,6 @@
+import sys
+
+data = sys.stdin.buffer.read().split()
+n = int(data[0])
+# Sorts as strings
+print(' '.join(sorted(x.decode() for x in data[1:n + 1])))
@@ -0,0 +1,16 @@
+#include <cstdio>
+#include <vector>
+
+int main() {
+    int n;
+    scanf("%d", &n);
+    // Touch 256 MB before answering
+    std::vector<long long> buffer(32 * 1024 * 1024, 1);
+    long long sum = 0;
+    for (int i = 0; i < n; i++) {
+        long long x;
+        scanf("%lld", &x);
+        sum += x;
+    }
+    printf("%lld\n", sum + buffer[n] - 1);
+}
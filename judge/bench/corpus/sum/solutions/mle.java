@@ -0,0 +1,21 @@
+import java.io.*;
+import java.util.*;
+
+public class Solution {
+    public static void main(String[] args) throws IOException {
+        // Keep 256 MB alive before answering
+        List<long[]> blocks = new ArrayList<>();
+        for (int i = 0; i < 256; i++) {
+            blocks.add(new long[128 * 1024]);
+        }
+        StreamTokenizer in = new StreamTokenizer(new BufferedReader(new InputStreamReader(System.in)));
+        in.nextToken();
+        int n = (int) in.nval;
+        long sum = 0;
+        for (int i = 0; i < n; i++) {
+            in.nextToken();
+            sum += (long) in.nval;
+        }
+        System.out.println(sum + blocks.size() - 256);
+    }
+}
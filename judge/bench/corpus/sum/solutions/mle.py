@@ -0,0 +1,7 @@
+import sys
+
+data = sys.stdin.buffer.read().split()
+n = int(data[0])
+# Keep 256 MB alive before answering
+blocks = [bytearray(1024 * 1024) for _ in range(256)]
+print(sum(map(int, data[1:n + 1])))
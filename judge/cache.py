@@ -0,0 +1,116 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+class CompileCache:
+    """Content-addressed on-disk cache of compiled artifacts with LRU eviction by disk size.
+
+    Entries in use are pinned and never evicted. Pins only cover this process;
+    judges sharing a cache directory rely on entries in use being recent.
+    """
+
+    def __init__(self, root: str, max_bytes: int, on_evict: Optional[Callable[[str], None]] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict  # Called with the path of every evicted entry
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, List] = {}  # key -> [lock, number of threads using it]
+        self._pins: Dict[str, int] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(language: str, code: str, flags) -> str:
+        """Hash the language, compiler flags and source into a cache key."""
+        h = hashlib.sha256()
+        for part in (language, '\0'.join(flags), code):
+            h.update(part.encode())
+            h.update(b'\0\0')
+        return h.hexdigest()
+
+    @contextmanager
+    def lock(self, key: str):
+        """Serialize compilation of one key; the lock is dropped once no thread needs it."""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str, pin: bool = False) -> Optional[str]:
+        """Return the artifact directory for a key, marking it recently used and optionally pinning it."""
+        path = self.path(key)
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+            if pin:
+                self._pins[path] = self._pins.get(path, 0) + 1
+        return path
+
+    def unpin(self, path: str):
+        """Release a pin taken by get() or put(), letting the entry be evicted again."""
+        with self._lock:
+            self._pins[path] -= 1
+            if self._pins[path] == 0:
+                del self._pins[path]
+
+    def build_dir(self) -> str:
+        """Create a scratch directory to compile into before calling put()."""
+        return tempfile.mkdtemp(prefix='.build-', dir=self.root)
+
+    def put(self, key: str, build_dir: str, pin: bool = False) -> str:
+        """Atomically move a finished build into the cache and evict old entries."""
+        path = self.path(key)
+        with self._lock:
+            try:
+                os.rename(build_dir, path)
+            except OSError:
+                # Another process stored the same key first
+                shutil.rmtree(build_dir, ignore_errors=True)
+            if pin:
+                self._pins[path] = self._pins.get(path, 0) + 1
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.root):
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue  # Evicted concurrently
+            total += size
+            if entry.path != keep:
+                entries.append((mtime, size, entry.path))
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            with self._lock:
+                if path in self._pins:
+                    continue  # A submission is using it
+                shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            if self.on_evict is not None:
+                self.on_evict(path)
@@ -0,0 +1,321 @@
+import math
+import tempfile
+import time
+from collections import deque
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+WHITESPACE = b' \t\n\r\x0b\x0c'
+CHUNK_SIZE = 64 * 1024
+
+
+class Comparator:
+    """Base of the comparators that check a program's output while it runs.
+
+    Subclasses implement _feed(), _finish() and excerpts(); the public methods
+    add the time spent to `compare_time`. `message` holds an explanation of a
+    wrong answer when the comparator has one.
+    """
+
+    compare_time = 0.0  # Milliseconds spent in feed() and finish()
+    message: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        """Whether the verdict is already known and the program can be stopped."""
+        return False
+
+    def feed(self, chunk: bytes):
+        """Compare the next chunk of output."""
+        start = time.perf_counter()
+        self._feed(chunk)
+        self.compare_time += (time.perf_counter() - start) * 1000
+
+    def finish(self) -> bool:
+        """Call at the end of the output; returns whether the outputs match."""
+        start = time.perf_counter()
+        matched = self._finish()
+        self.compare_time += (time.perf_counter() - start) * 1000
+        return matched
+
+    def _feed(self, chunk: bytes):
+        raise NotImplementedError
+
+    def _finish(self) -> bool:
+        raise NotImplementedError
+
+    def excerpts(self) -> Tuple[str, str]:
+        """Return the (expected, got) excerpts around the first difference."""
+        raise NotImplementedError
+
+
+class OutputComparator(Comparator):
+    """Compares a program's output with the expected output incrementally.
+
+    The outputs match when they are equal after stripping leading and trailing
+    whitespace. Only a bounded excerpt around the first difference is kept.
+    """
+
+    def __init__(self, expected: BinaryIO, before: int = 256, after: int = 4096):
+        self.expected = expected
+        self.before = before
+        self.after = after
+        self.start, self.end = self._stripped_bounds()
+        self.expected.seek(self.start)
+        self.pos = self.start  # Next expected byte to match
+        self.state = 'leading'  # leading -> matching -> trailing, or mismatch
+        self.matched = 0  # Output bytes matched so far, after leading whitespace
+        self.tail = bytearray()  # Last `before` output bytes before the difference
+        self.got_after = bytearray()  # Output bytes from the difference on
+        self.mismatch_at = None  # Offset of the difference in the expected output
+
+    def _stripped_bounds(self) -> Tuple[int, int]:
+        """Find where the expected output starts and ends once whitespace is stripped."""
+        self.expected.seek(0, 2)
+        size = self.expected.tell()
+
+        start = 0
+        self.expected.seek(0)
+        while start < size:
+            chunk = self.expected.read(CHUNK_SIZE)
+            stripped = chunk.lstrip(WHITESPACE)
+            start += len(chunk) - len(stripped)
+            if stripped:
+                break
+
+        end = size
+        while end > start:
+            offset = max(start, end - CHUNK_SIZE)
+            self.expected.seek(offset)
+            chunk = self.expected.read(end - offset)
+            stripped = chunk.rstrip(WHITESPACE)
+            end = offset + len(stripped)
+            if stripped:
+                break
+        return start, end
+
+    @property
+    def done(self) -> bool:
+        return self.state == 'mismatch' and len(self.got_after) >= self.after
+
+    def _keep(self, data):
+        self.tail += data
+        del self.tail[:-self.before]
+        self.matched += len(data)
+
+    def _mismatch(self, rest):
+        self.state = 'mismatch'
+        self.mismatch_at = self.pos
+        self.got_after += rest[:self.after]
+
+    def _feed(self, chunk: bytes):
+        if self.state == 'mismatch':
+            self.got_after += chunk[:self.after - len(self.got_after)]
+            return
+
+        i = 0
+        if self.state == 'leading':
+            stripped = chunk.lstrip(WHITESPACE)
+            if not stripped:
+                return
+            i = len(chunk) - len(stripped)
+            self.state = 'matching' if self.pos < self.end else 'trailing'
+
+        while self.state == 'matching' and i < len(chunk):
+            need = min(len(chunk) - i, self.end - self.pos)
+            expected = self.expected.read(need)
+            segment = chunk[i:i + need]
+            if segment != expected:
+                j = next(k for k in range(len(expected)) if segment[k] != expected[k])
+                self._keep(segment[:j])
+                self.pos += j
+                self._mismatch(chunk[i + j:])
+                return
+            self._keep(segment)
+            self.pos += need
+            i += need
+            if self.pos == self.end:
+                self.state = 'trailing'
+
+        if self.state == 'trailing' and i < len(chunk):
+            # Only whitespace may follow the expected output
+            rest = chunk[i:]
+            stripped = rest.lstrip(WHITESPACE)
+            if stripped:
+                self._keep(rest[:len(rest) - len(stripped)])
+                self._mismatch(stripped)
+            else:
+                self._keep(rest)
+
+    def _finish(self) -> bool:
+        if self.state == 'mismatch':
+            return False
+        if self.state == 'leading' and self.start == self.end:
+            return True
+        if self.state == 'trailing':
+            return True
+        # The output ended before the expected output did
+        self._mismatch(b'')
+        return False
+
+    def excerpts(self) -> Tuple[str, str]:
+        first = max(self.start, self.mismatch_at - self.before)
+        last = min(self.end, self.mismatch_at + self.after)
+        self.expected.seek(first)
+        expected = self.expected.read(last - first).decode(errors='replace')
+        if first > self.start:
+            expected = '...' + expected
+        if last < self.end:
+            expected += '...'
+
+        got = bytes(self.tail + self.got_after).decode(errors='replace').rstrip()
+        if self.matched > len(self.tail):
+            got = '...' + got
+        if len(self.got_after) >= self.after:
+            got += '...'
+        return expected, got
+
+
+def read_tokens(f: BinaryIO) -> Iterator[bytes]:
+    """Yield the whitespace separated tokens of a file without reading it whole."""
+    f.seek(0)
+    partial = b''
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        tokens = (partial + chunk).split()
+        # The last token may continue in the next chunk
+        partial = tokens.pop() if tokens and chunk[-1:] not in WHITESPACE else b''
+        yield from tokens
+    if partial:
+        yield partial
+
+
+class TokenComparator(Comparator):
+    """Compares outputs token by token, so any amount of whitespace between tokens matches."""
+
+    def __init__(self, expected: BinaryIO, context: int = 16, after: int = 4096):
+        self.expected = expected
+        self.after = after
+        self.expected_tokens = read_tokens(expected)
+        self.partial = b''  # Output token that may continue in the next chunk
+        self.context = deque(maxlen=context)  # Last tokens matched
+        self.mismatch = None  # (expected token or None, got token or None)
+        self.got_after = bytearray()  # Output from the differing token on
+
+    @property
+    def done(self) -> bool:
+        return self.mismatch is not None and len(self.got_after) >= self.after
+
+    def equal(self, got: bytes, expected: bytes) -> bool:
+        return got == expected
+
+    def _check(self, token: bytes) -> bool:
+        expected = next(self.expected_tokens, None)
+        if expected is not None and self.equal(token, expected):
+            self.context.append(token)
+            return True
+        self.mismatch = (expected, token)
+        return False
+
+    def _feed(self, chunk: bytes):
+        if self.mismatch is not None:
+            self.got_after += chunk[:self.after - len(self.got_after)]
+            return
+        data = self.partial + chunk
+        tokens = data.split()
+        self.partial = tokens.pop() if tokens and data[-1:] not in WHITESPACE else b''
+        for i, token in enumerate(tokens):
+            if not self._check(token):
+                self.got_after += b' '.join(tokens[i:] + [self.partial])[:self.after]
+                return
+
+    def _finish(self) -> bool:
+        if self.mismatch is None and self.partial and not self._check(self.partial):
+            self.got_after += self.partial[:self.after]
+        if self.mismatch is not None:
+            return False
+        extra = next(self.expected_tokens, None)
+        if extra is not None:
+            # The output ended before the expected output did
+            self.mismatch = (extra, None)
+            return False
+        return True
+
+    def excerpts(self) -> Tuple[str, str]:
+        expected = [self.mismatch[0]] if self.mismatch[0] is not None else []
+        for token in self.expected_tokens:
+            if len(expected) > self.context.maxlen:
+                expected.append(b'...')
+                break
+            expected.append(token)
+        before = (b'... ' if len(self.context) == self.context.maxlen else b'') + b' '.join(self.context)
+        got = bytes(self.got_after)
+        if len(got) >= self.after:
+            got += b'...'
+        return (b' '.join([before, *expected]).strip().decode(errors='replace'),
+                b' '.join([before, got]).strip().decode(errors='replace'))
+
+
+class FloatComparator(TokenComparator):
+    """Token comparison where numbers match within an absolute or relative error."""
+
+    def __init__(self, expected: BinaryIO, abs_eps: float = 1e-6, rel_eps: float = 1e-6, **kwargs):
+        super().__init__(expected, **kwargs)
+        self.abs_eps = abs_eps
+        self.rel_eps = rel_eps
+
+    def equal(self, got: bytes, expected: bytes) -> bool:
+        if got == expected:
+            return True
+        try:
+            got_value, expected_value = float(got), float(expected)
+        except ValueError:
+            return False
+        if not (math.isfinite(got_value) and math.isfinite(expected_value)):
+            return False
+        error = abs(got_value - expected_value)
+        return error <= self.abs_eps or error <= self.rel_eps * abs(expected_value)
+
+
+class CustomComparator(Comparator):
+    """Spools the output to a file and leaves the verdict to a checker program.
+
+    `check(output_path)` runs the checker and returns (accepted, message).
+    """
+
+    def __init__(self, expected: BinaryIO, check: Callable[[str], Tuple[bool, str]], excerpt: int = 4096):
+        self.expected = expected
+        self.check = check
+        self.excerpt = excerpt
+        self.output = tempfile.NamedTemporaryFile(prefix='cms-output-')
+
+    def _feed(self, chunk: bytes):
+        self.output.write(chunk)
+
+    def _finish(self) -> bool:
+        self.output.flush()
+        try:
+            accepted, self.message = self.check(self.output.name)
+        finally:
+            self.output.seek(0)
+            self.got = self.output.read(self.excerpt)
+            self.output.close()
+        return accepted
+
+    def excerpts(self) -> Tuple[str, str]:
+        self.expected.seek(0)
+        expected = self.expected.read(self.excerpt)
+        return expected.decode(errors='replace').rstrip(), self.got.decode(errors='replace').rstrip()
+
+
+def builtin_comparator(checker: Optional[dict], expected: BinaryIO) -> Comparator:
+    """Return the comparator of a built-in checker spec; None or 'exact' keeps the stripped exact match."""
+    checker_type = (checker or {}).get('type', 'exact')
+    if checker_type == 'tokens':
+        return TokenComparator(expected)
+    if checker_type == 'float':
+        return FloatComparator(expected, float(checker.get('abs_eps', 1e-6)), float(checker.get('rel_eps', 1e-6)))
+    if checker_type == 'exact':
+        return OutputComparator(expected)
+    raise ValueError(f"Unknown checker type: {checker_type}")
@@ -0,0 +1,120 @@
+"""Long-running custom checker processes, reused across tests and submissions.
+
+A checker is started once and then answers one request per line on stdin:
+
+    <input path>\t<output path>\t<answer path>
+
+with one line on stdout: `AC`, or `WA` optionally followed by a message for
+the contestant. The output file holds the program's output and the answer
+file the expected output of the test.
+"""
+import os
+import select
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class CheckerError(Exception):
+    """Raised when a checker crashes, hangs or answers something else than AC or WA."""
+
+
+class CheckerProcess:
+    """One running checker answering requests one at a time."""
+
+    def __init__(self, command: List[str]):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, start_new_session=True)
+        self.buffer = b''
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _readline(self, timeout: float) -> bytes:
+        deadline = time.monotonic() + timeout
+        fd = self.process.stdout.fileno()
+        while b'\n' not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise CheckerError('Checker timed out')
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                raise CheckerError('Checker exited')
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line
+
+    def check(self, input_path: str, output_path: str, answer_path: str, timeout: float) -> Tuple[bool, str]:
+        try:
+            self.process.stdin.write(f'{input_path}\t{output_path}\t{answer_path}\n'.encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise CheckerError('Checker exited')
+        verdict, _, message = self._readline(timeout).decode(errors='replace').strip().partition(' ')
+        if verdict not in ('AC', 'WA'):
+            raise CheckerError(f'Checker answered {verdict!r}')
+        return verdict == 'AC', message.strip()
+
+    def close(self):
+        try:
+            self.process.kill()
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class CheckerPool:
+    """Idle checker processes per checker, started on demand.
+
+    Tests judged at the same time each get their own process; at most
+    `max_idle` of them are kept per checker once they are done.
+    """
+
+    def __init__(self, max_idle: int = 4, timeout: float = 10):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle: Dict[str, List[CheckerProcess]] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key: str, command: List[str]) -> CheckerProcess:
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                checker = idle.pop()
+                if checker.alive:
+                    return checker
+                checker.close()
+        return CheckerProcess(command)
+
+    def _release(self, key: str, checker: CheckerProcess):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(checker)
+                return
+        checker.close()
+
+    def check(self, key: str, command: List[str], input_path: str, output_path: str,
+              answer_path: str) -> Tuple[bool, str]:
+        """Check one output with a warm process of the checker identified by `key`."""
+        checker = self._acquire(key, command)
+        try:
+            verdict = checker.check(input_path, output_path, answer_path, self.timeout)
+        except CheckerError:
+            # A checker in an unknown state is not reused
+            checker.close()
+            raise
+        self._release(key, checker)
+        return verdict
+
+    def close(self, key: Optional[str] = None):
+        """Stop the idle processes of one checker, or of all of them."""
+        with self._lock:
+            keys = [key] if key is not None else list(self._idle)
+            checkers = [checker for k in keys for checker in self._idle.pop(k, [])]
+        for checker in checkers:
+            checker.close()
@@ -0,0 +1,220 @@
+"""Launch profile for Java submissions.
+
+Starting a JVM takes 100-300 ms of CPU, mostly loading and verifying the
+standard library classes. The profile cuts that down and keeps what is left
+out of the time limit:
+
+- A class data sharing (AppCDS) archive of the classes contest programs
+  commonly load is dumped once per JDK and mapped by every run.
+- Runs use the serial collector and a heap sized from the memory limit, so
+  the JVM does not start GC threads or reserve a heap it is not allowed to
+  fill.
+- A small launcher class starts before `Solution`. It prints the CPU time
+  the JVM used to get there as the first line of stderr, and the judge
+  reports it as startup time instead of execution time. The program cannot
+  write to stderr before the launcher, so it cannot change the figure.
+
+The archive lives in `<root>/<hash of java -version>`, next to the launcher
+JAR, and is rebuilt when the JDK changes.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# First line the launcher prints to stderr, followed by the startup CPU time in microseconds
+STARTUP_MARKER = 'cms-jvm-startup '
+
+# Metaspace, code cache, thread stacks and the JVM itself, left out of the heap
+NON_HEAP_MB = 64
+
+# Seconds added to the CPU and wall-clock limits so a program close to its limit is not stopped for the JVM's startup
+STARTUP_ALLOWANCE = 1
+
+LAUNCHER_SOURCE = r'''
+import java.lang.reflect.InvocationTargetException;
+import java.time.Duration;
+
+public class CmsLauncher {
+    public static void main(String[] args) throws Throwable {
+        Duration cpu = ProcessHandle.current().info().totalCpuDuration().orElse(Duration.ZERO);
+        System.err.print("cms-jvm-startup " + cpu.toNanos() / 1000 + "\n");
+        System.err.flush();
+        try {
+            Class.forName(System.getProperty("cms.main", "Solution")).getMethod("main", String[].class).invoke(null, (Object) args);
+        } catch (InvocationTargetException e) {
+            throw e.getCause();
+        }
+    }
+}
+'''
+
+# Touches the classes contest programs usually need, to find what goes in the archive
+WARMUP_SOURCE = r'''
+import java.io.*;
+import java.math.BigInteger;
+import java.util.*;
+import java.util.stream.*;
+
+public class CmsWarmup {
+    public static void main(String[] args) throws IOException {
+        String text = "3 1 2\nabc 1.5\n";
+        Scanner scanner = new Scanner(new ByteArrayInputStream(text.getBytes()));
+        int n = scanner.nextInt();
+        BufferedReader reader = new BufferedReader(new InputStreamReader(new ByteArrayInputStream(text.getBytes())));
+        StringTokenizer tokens = new StringTokenizer(reader.readLine());
+        StreamTokenizer stream = new StreamTokenizer(new StringReader(text));
+        stream.nextToken();
+        List<Integer> list = new ArrayList<>();
+        while (tokens.hasMoreTokens()) {
+            list.add(Integer.parseInt(tokens.nextToken()));
+        }
+        Collections.sort(list);
+        int[] array = list.stream().mapToInt(Integer::intValue).toArray();
+        Arrays.sort(array);
+        long[] longs = new long[n];
+        Arrays.fill(longs, Long.parseLong("1"));
+        Map<String, Integer> map = new HashMap<>();
+        map.merge("a", 1, Integer::sum);
+        TreeMap<Integer, Integer> tree = new TreeMap<>(map.values().stream().collect(Collectors.toMap(x -> x, x -> x)));
+        Set<Long> set = new HashSet<>(Arrays.asList(1L, 2L));
+        Deque<int[]> deque = new ArrayDeque<>();
+        deque.add(new int[]{1, 2});
+        PriorityQueue<long[]> heap = new PriorityQueue<>((a, b) -> Long.compare(a[0], b[0]));
+        heap.add(new long[]{3});
+        BigInteger big = BigInteger.valueOf(n).pow(20).mod(BigInteger.TEN);
+        StringBuilder builder = new StringBuilder();
+        builder.append(String.format("%.6f %d", Math.sqrt(Double.parseDouble("1.5")), big.intValue()));
+        builder.append(tree.firstKey()).append(set.size()).append(deque.poll().length).append(heap.poll()[0]);
+        builder.append(IntStream.range(0, n).boxed().map(String::valueOf).collect(Collectors.joining(" ")));
+        PrintWriter out = new PrintWriter(new BufferedWriter(new OutputStreamWriter(new ByteArrayOutputStream())));
+        out.println(builder);
+        out.printf("%d%n", array.length);
+        out.flush();
+    }
+}
+'''
+
+
+def heap_size(memory_limit: int) -> int:
+    """-Xmx in MB for a memory limit in MB, leaving room for what the JVM keeps outside the heap."""
+    return max(memory_limit // 2, memory_limit - NON_HEAP_MB)
+
+
+def split_startup(stderr: str) -> Tuple[Optional[float], str]:
+    """Take the launcher's startup line off a program's stderr; returns (startup CPU ms or None, the rest)."""
+    if not stderr.startswith(STARTUP_MARKER):
+        return None, stderr
+    line, _, rest = stderr.partition('\n')
+    try:
+        return int(line[len(STARTUP_MARKER):]) / 1000, rest
+    except ValueError:
+        return None, rest
+
+
+class JavaProfile:
+    """The launcher JAR and CDS archive for the installed JDK, prepared on first use."""
+
+    def __init__(self, root: str, extra_flags: List[str] = ()):
+        self.root = root
+        self.extra_flags = list(extra_flags)
+        self._lock = threading.Lock()
+        self._prepared = False
+        self.jar = None
+        self.archive = None
+
+    def _java_version(self) -> str:
+        result = subprocess.run(['java', '-version'], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise OSError(result.stderr.strip() or 'java -version failed')
+        return result.stderr
+
+    def _build(self, path: str):
+        """Compile the launcher and dump the archive into `path`.
+
+        The archive records the launcher's class path, so it is dumped in its
+        final place rather than moved there.
+        """
+        classes_dir = os.path.join(path, 'classes')
+        jar = os.path.join(path, 'launcher.jar')
+        os.makedirs(classes_dir, exist_ok=True)
+        for name, source in (('CmsLauncher.java', LAUNCHER_SOURCE), ('CmsWarmup.java', WARMUP_SOURCE)):
+            with open(os.path.join(path, name), 'w') as f:
+                f.write(source)
+        # CDS only archives application classes loaded from JAR files, not from directories
+        for command in (['javac', '-d', classes_dir, 'CmsLauncher.java', 'CmsWarmup.java'],
+                        ['jar', 'cf', jar, '-C', classes_dir, '.']):
+            result = subprocess.run(command, cwd=path, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise OSError(f"Could not build the Java launcher: {result.stderr.strip()}")
+
+        class_list = os.path.join(path, 'classes.lst')
+        archive = os.path.join(path, 'classes.jsa')
+        # The warmup runs through the launcher so the launcher's own classes are archived too.
+        # The archive records the JAR's path, which later runs put first on their class path
+        warmup = ['-cp', jar, '-Dcms.main=CmsWarmup', 'CmsLauncher']
+        steps = [
+            ['java', '-Xshare:off', f'-XX:DumpLoadedClassList={class_list}', *warmup],
+            ['java', '-Xshare:dump', '-XX:+UseSerialGC', f'-XX:SharedClassListFile={class_list}',
+             f'-XX:SharedArchiveFile={archive}', '-cp', jar],
+            # -Xshare:on fails instead of silently running without an archive the JVM rejects
+            ['java', '-Xshare:on', '-XX:+UseSerialGC', f'-XX:SharedArchiveFile={archive}', *warmup]
+        ]
+        for command in steps:
+            result = subprocess.run(command, cwd=path, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"Java class data sharing archive could not be built, running without it: {result.stderr.strip()}")
+                if os.path.exists(archive):
+                    os.unlink(archive)
+                break
+
+        # Sandbox slots may run the JVM as another user
+        for directory, _, files in os.walk(path):
+            os.chmod(directory, 0o755)
+            for name in files:
+                os.chmod(os.path.join(directory, name), 0o644)
+        with open(os.path.join(path, 'ready'), 'w'):
+            pass
+
+    def _prepare(self):
+        version = self._java_version()
+        path = os.path.join(self.root, hashlib.sha256(version.encode()).hexdigest()[:16])
+        os.makedirs(self.root, exist_ok=True)
+        os.chmod(self.root, 0o755)
+        with open(os.path.join(self.root, '.lock'), 'w') as lock_file:
+            # Judge processes on the same host share the directory, one of them builds it
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not os.path.exists(os.path.join(path, 'ready')):
+                shutil.rmtree(path, ignore_errors=True)  # Left over from a build that died
+                self._build(path)
+        self.jar = os.path.join(path, 'launcher.jar')
+        archive = os.path.join(path, 'classes.jsa')
+        self.archive = archive if os.path.exists(archive) else None
+
+    def prepare(self) -> bool:
+        """Build or find the launcher and archive; False if the tuned profile cannot be used."""
+        with self._lock:
+            if not self._prepared:
+                self._prepared = True
+                try:
+                    self._prepare()
+                except OSError as e:
+                    print(f"Java launch profile is not available, using plain java: {str(e)}")
+                    self.jar = None
+            return self.jar is not None
+
+    def command(self, artifact_dir: str, memory_limit: int) -> List[str]:
+        """The command running a compiled Solution through the launcher."""
+        command = ['java', '-XX:+UseSerialGC', '-XX:+TieredCompilation', '-XX:-UsePerfData', '-Xss64m',
+                   f'-Xmx{heap_size(memory_limit)}m']
+        if self.archive is not None:
+            command += ['-Xshare:auto', f'-XX:SharedArchiveFile={self.archive}']
+        return command + self.extra_flags + ['-cp', os.pathsep.join([self.jar, artifact_dir]), 'CmsLauncher']
@@ -0,0 +1,143 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import JSON, Column, Float, Index, Integer, MetaData, String, Table, delete, func, insert, or_, select, update
+from sqlalchemy.engine import Engine
+
+metadata = MetaData()
+
+# Submissions and /run_code requests waiting for, or judged by, a remote judge worker
+judge_jobs = Table(
+    'judge_job', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('submission_id', Integer, unique=True),  # None for /run_code jobs, which the requester collects itself
+    Column('payload', JSON, nullable=False),  # Code, language, limits and test data hashes
+    Column('status', String(20), nullable=False),  # queued -> leased -> done
+    Column('priority', Integer, nullable=False, default=0),  # Lower is leased first, see judge.pool
+    Column('worker_id', String(100)),
+    Column('lease_expires_at', Float),  # Unix time; a worker that stops heartbeating loses the job after this
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('created_at', Float, nullable=False),
+    Column('result', JSON),  # judge_submission() result, or {'error': ...}
+    Index('ix_judge_job_status_lease', 'status', 'lease_expires_at')
+)
+
+
+class JobQueue:
+    """Judge job queue kept in a database table shared by the web tier and judge workers.
+
+    Jobs are leased for a limited time. Workers extend the lease with
+    heartbeats while judging, so the job of a worker that dies is handed to
+    another worker once its lease expires.
+    """
+
+    def __init__(self, engine: Engine, max_attempts: int = 3):
+        self.engine = engine
+        self.max_attempts = max_attempts
+
+    def create_table(self):
+        metadata.create_all(self.engine)
+
+    def enqueue(self, submission_id: Optional[int], payload: Dict[str, Any], priority: int = 0) -> int:
+        """Queue a submission unless it is already queued, or a /run_code job if submission_id is None.
+
+        Returns the id of the job.
+        """
+        with self.engine.begin() as conn:
+            if submission_id is not None:
+                exists = conn.execute(select(judge_jobs.c.id).where(judge_jobs.c.submission_id == submission_id)).first()
+                if exists is not None:
+                    return exists.id
+            return conn.execute(insert(judge_jobs).values(
+                submission_id=submission_id, payload=payload, status='queued', priority=priority,
+                attempts=0, created_at=time.time()
+            ).returning(judge_jobs.c.id)).scalar_one()
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued or abandoned job of the highest priority, or return None if there is none."""
+        now = time.time()
+        available = or_(
+            judge_jobs.c.status == 'queued',
+            (judge_jobs.c.status == 'leased') & (judge_jobs.c.lease_expires_at < now)
+        )
+        with self.engine.begin() as conn:
+            # Jobs that keep killing their workers are given up on
+            conn.execute(update(judge_jobs)
+                         .where(available, judge_jobs.c.attempts >= self.max_attempts)
+                         .values(status='done', result={'error': 'Judging failed too many times'}))
+
+            oldest = select(judge_jobs.c.id).where(available).order_by(judge_jobs.c.priority, judge_jobs.c.id).limit(1).scalar_subquery()
+            row = conn.execute(
+                update(judge_jobs)
+                .where(judge_jobs.c.id == oldest, available)
+                .values(status='leased', worker_id=worker_id, lease_expires_at=now + lease_seconds,
+                        attempts=judge_jobs.c.attempts + 1)
+                .returning(judge_jobs.c.id, judge_jobs.c.submission_id, judge_jobs.c.payload, judge_jobs.c.created_at)
+            ).first()
+        return dict(row._mapping) if row is not None else None
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """Extend a lease; returns False if the job was handed to another worker."""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(judge_jobs)
+                .where(judge_jobs.c.id == job_id, judge_jobs.c.worker_id == worker_id, judge_jobs.c.status == 'leased')
+                .values(lease_expires_at=time.time() + lease_seconds)
+            )
+        return result.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Store the result of a leased job; returns False if the lease was lost."""
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                update(judge_jobs)
+                .where(judge_jobs.c.id == job_id, judge_jobs.c.worker_id == worker_id, judge_jobs.c.status == 'leased')
+                .values(status='done', result=result, lease_expires_at=None)
+            )
+        return updated.rowcount == 1
+
+    def finished(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return judged submissions that the web tier has not applied yet."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(judge_jobs.c.id, judge_jobs.c.submission_id, judge_jobs.c.payload, judge_jobs.c.result,
+                       judge_jobs.c.created_at)
+                .where(judge_jobs.c.status == 'done', judge_jobs.c.submission_id.isnot(None))
+                .order_by(judge_jobs.c.id)
+                .limit(limit)
+            )
+            return [dict(row._mapping) for row in rows]
+
+    def remove(self, job_id: int) -> bool:
+        """Delete a finished job once its result is applied; False if another process got to it first."""
+        with self.engine.begin() as conn:
+            result = conn.execute(delete(judge_jobs).where(judge_jobs.c.id == job_id, judge_jobs.c.status == 'done'))
+        return result.rowcount == 1
+
+    def take_result(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Remove a finished /run_code job and return its result, or None while it is not finished."""
+        with self.engine.begin() as conn:
+            return conn.execute(
+                delete(judge_jobs).where(judge_jobs.c.id == job_id, judge_jobs.c.status == 'done')
+                .returning(judge_jobs.c.result)
+            ).scalar()
+
+    def discard(self, job_id: int):
+        """Drop a job whatever its state; a worker judging it loses its lease."""
+        with self.engine.begin() as conn:
+            conn.execute(delete(judge_jobs).where(judge_jobs.c.id == job_id))
+
+    def stats(self) -> Dict[str, int]:
+        """Return the workers holding a job, leased jobs and queue depth, like JudgePool.stats()."""
+        now = time.time()
+        with self.engine.connect() as conn:
+            queued = conn.execute(select(func.count()).where(judge_jobs.c.status == 'queued')).scalar()
+            leased = conn.execute(
+                select(func.count(), func.count(judge_jobs.c.worker_id.distinct()))
+                .where(judge_jobs.c.status == 'leased', judge_jobs.c.lease_expires_at >= now)
+            ).first()
+        return {
+            'workers': leased[1],
+            'busy': leased[0],
+            'queue_depth': queued
+        }
@@ -1,147 +1,574 @@
+import hashlib
+import io
 import os
 import json
-import psutil
+import queue
+import signal
+import socket
 import subprocess
 import tempfile
+import threading
 import time
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from typing import Any, BinaryIO, Dict, Optional
 
-def compile_code(code, language):
-    """Compile the code based on the language."""
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=get_file_extension(language)) as f:
-        f.write(code)
-        source_file = f.name
+from judge.cache import CompileCache
+from judge.checker import CHUNK_SIZE, Comparator, CustomComparator, builtin_comparator
+from judge.checkerpool import CheckerError, CheckerPool
+from judge.javarunner import STARTUP_ALLOWANCE, JavaProfile, split_startup
+from judge.limits import (CPU_LIMIT_EXIT_CODE, OUT_OF_MEMORY_MARKERS, Cgroup, address_space_limit,
+                          cgroups_available, cpu_limit_seconds, set_rlimits, wall_time_limit)
+from judge.parallel import CancelToken, CpuPool
+from judge.pyrunner import PythonForkServer
+from judge.sandbox import SandboxPool
+from judge.spawn import Launcher, read_report
+from judge.testdata import pair_hash
 
+# Extra compiler flags per language, part of the compile cache key
+COMPILE_FLAGS = {
+    'cpp': os.environ.get('JUDGE_CPP_FLAGS', '').split(),
+    'java': os.environ.get('JUDGE_JAVA_FLAGS', '').split(),
+    'python': []
+}
+
+# 'forkserver' runs Python tests in children of a warm zygote, 'subprocess' starts a fresh interpreter per test
+PYTHON_MODE = os.environ.get('JUDGE_PYTHON_MODE', 'forkserver' if hasattr(os, 'fork') and hasattr(socket, 'send_fds') else 'subprocess')
+python_forkserver = None
+forkserver_lock = threading.Lock()
+
+# 'tuned' runs Java through a launcher with a class data sharing archive and reports JVM startup on its own,
+# 'plain' runs `java -Xmx<memory limit>m Solution`
+JAVA_PROFILE = os.environ.get('JUDGE_JAVA_PROFILE', 'tuned')
+java_profile = JavaProfile(
+    os.environ.get('JUDGE_JAVA_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'cms-java')),
+    os.environ.get('JUDGE_JAVA_RUN_FLAGS', '').split()
+)
+
+# Test cases run concurrently per submission, optionally each pinned to its own CPU
+PARALLELISM = int(os.environ.get('JUDGE_PARALLELISM', 1))
+PIN_CPUS = os.environ.get('JUDGE_PIN_CPUS', '0') == '1'
+cpu_pool = CpuPool()
+
+# Programs printing more than this are stopped with OLE; only the start of stderr is kept
+OUTPUT_LIMIT = int(os.environ.get('JUDGE_OUTPUT_LIMIT_MB', 64)) * 1024 * 1024
+STDERR_LIMIT = 64 * 1024
+
+# Runs go in their own cgroup when a delegated cgroup v2 directory is configured
+USE_CGROUPS = cgroups_available()
+
+# Programs run in reusable slots: a working directory, a stderr file and, when running as root, their own user
+sandbox_pool = SandboxPool(
+    os.environ.get('JUDGE_SANDBOX_DIR', os.path.join(tempfile.gettempdir(), 'cms-sandbox')),
+    int(os.environ.get('JUDGE_SANDBOX_SLOTS', max(4, 2 * (os.cpu_count() or 1)))),
+    uid_base=int(os.environ['JUDGE_SANDBOX_UID']) if os.environ.get('JUDGE_SANDBOX_UID') else None,
+    isolate_network=os.environ.get('JUDGE_SANDBOX_NETWORK', '1') == '0'
+)
+
+# Programs are forked from a small launcher, so their peak memory does not count the judge's
+launcher = Launcher(os.environ.get('JUDGE_LAUNCHER_DIR', os.path.join(tempfile.gettempdir(), 'cms-spawn')),
+                    os.environ.get('JUDGE_CC', 'cc'))
+
+# Custom checkers stay running between tests; one that takes longer than this on a test is a judge error
+checker_pool = CheckerPool(timeout=float(os.environ.get('JUDGE_CHECKER_TIMEOUT', 10)))
+CHECKER_MEMORY_LIMIT = 1024  # in MB, only used for the -Xmx of Java checkers
+
+compile_cache = CompileCache(
+    os.environ.get('JUDGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'cms-judge-cache')),
+    int(os.environ.get('JUDGE_CACHE_MAX_MB', 512)) * 1024 * 1024,
+    on_evict=checker_pool.close  # Idle checkers of an evicted entry could not load anything from it
+)
+
+def get_source_name(language):
+    """Get the source file name for the given language."""
+    names = {
+        'cpp': 'solution.cpp',
+        'java': 'Solution.java',
+        'python': 'solution.py'
+    }
+    return names.get(language)
+
+def compile_code(code, language, stack: Optional[ExitStack] = None):
+    """Compile the code once, reusing a cached artifact for identical source.
+
+    Returns (artifact_dir, None) on success or (None, error) on a compile error.
+    With an ExitStack, the artifact is not evicted until the stack closes.
+    """
+    source_name = get_source_name(language)
+    if source_name is None:
+        return None, f"Unsupported language: {language}"
+
+    flags = COMPILE_FLAGS[language]
+    key = CompileCache.key(language, code, flags)
+    with compile_cache.lock(key):
+        artifact_dir = compile_cache.get(key, pin=stack is not None)
+        if artifact_dir is None:
+            build_dir = compile_cache.build_dir()
+            os.chmod(build_dir, 0o755)  # Sandbox slots may run the artifact as another user
+            source_file = os.path.join(build_dir, source_name)
+            with open(source_file, 'w') as f:
+                f.write(code)
+
+            # Compile inside the build directory so errors show relative file names
+            if language == 'cpp':
+                result = subprocess.run(['g++', *flags, source_name, '-o', 'solution'],
+                                        cwd=build_dir, capture_output=True, text=True)
+            elif language == 'java':
+                result = subprocess.run(['javac', *flags, source_name],
+                                        cwd=build_dir, capture_output=True, text=True)
+            else:
+                result = None
+
+            # Compile errors are cached too so identical resubmissions skip the compiler
+            if result is not None and result.returncode != 0:
+                with open(os.path.join(build_dir, 'compile_error.txt'), 'w') as f:
+                    f.write(result.stderr)
+            artifact_dir = compile_cache.put(key, build_dir, pin=stack is not None)
+    if stack is not None:
+        stack.callback(compile_cache.unpin, artifact_dir)
+
+    error_file = os.path.join(artifact_dir, 'compile_error.txt')
+    if os.path.exists(error_file):
+        with open(error_file) as f:
+            return None, f.read()
+    return artifact_dir, None
+
+def get_run_command(language, artifact_dir, memory_limit):
+    """Get the command that runs a compiled artifact."""
     if language == 'cpp':
-        executable = source_file + '.exe'
-        result = subprocess.run(['g++', source_file, '-o', executable], 
-                              capture_output=True, text=True)
-        if result.returncode != 0:
-            return None, result.stderr
-        return executable, None
+        return [os.path.join(artifact_dir, 'solution')]
     elif language == 'java':
-        result = subprocess.run(['javac', source_file], 
-                              capture_output=True, text=True)
-        if result.returncode != 0:
-            return None, result.stderr
-        return source_file.replace('.java', ''), None
-    elif language == 'python':
-        return source_file, None
+        return ['java', f'-Xmx{memory_limit}m', '-cp', artifact_dir, 'Solution']
     else:
-        return None, f"Unsupported language: {language}"
+        return ['python', os.path.join(artifact_dir, 'solution.py')]
 
-def get_file_extension(language):
-    """Get the file extension for the given language."""
-    extensions = {
-        'cpp': '.cpp',
-        'java': '.java',
-        'python': '.py'
-    }
-    return extensions.get(language, '')
-
-def run_code(code: str, language: str, test_case: Dict[str, str], time_limit: int, memory_limit: int) -> Dict[str, Any]:
-    """Run the code against a test case and return the result."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Write code to file
-        if language == 'python':
-            code_file = os.path.join(temp_dir, 'solution.py')
-        elif language == 'cpp':
-            code_file = os.path.join(temp_dir, 'solution.cpp')
-        elif language == 'java':
-            code_file = os.path.join(temp_dir, 'Solution.java')
-        else:
-            return {'status': 'CE', 'error': f'Unsupported language: {language}'}
-
-        with open(code_file, 'w') as f:
-            f.write(code)
-
-        # Compile if needed
-        if language == 'cpp':
-            compile_result = subprocess.run(['g++', code_file, '-o', os.path.join(temp_dir, 'solution')], 
-                                         capture_output=True, text=True)
-            if compile_result.returncode != 0:
-                return {'status': 'CE', 'error': compile_result.stderr}
-            executable = os.path.join(temp_dir, 'solution')
-        elif language == 'java':
-            compile_result = subprocess.run(['javac', code_file], capture_output=True, text=True)
-            if compile_result.returncode != 0:
-                return {'status': 'CE', 'error': compile_result.stderr}
-            executable = ['java', '-cp', temp_dir, 'Solution']
-        else:
-            executable = ['python', code_file]
-
-        # Run the code
-        start_time = time.time()
-        process = subprocess.Popen(
-            executable,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+def get_forkserver():
+    """Get the shared Python forkserver, creating it on first use."""
+    global python_forkserver
+    with forkserver_lock:
+        if python_forkserver is None:
+            python_forkserver = PythonForkServer()
+        return python_forkserver
 
-        try:
-            # Get process object for memory tracking
-            ps_process = psutil.Process(process.pid)
-            
-            # Send input
-            stdout, stderr = process.communicate(input=test_case['input'], timeout=time_limit/1000)
-            execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+def get_runner(language, artifact_dir, memory_limit):
+    """Get the function that executes a compiled artifact on one input."""
+    if language == 'python' and PYTHON_MODE == 'forkserver':
+        return partial(run_forkserver, os.path.join(artifact_dir, 'solution.py'))
+    if language == 'java' and JAVA_PROFILE == 'tuned' and java_profile.prepare():
+        return partial(run_java, java_profile.command(artifact_dir, memory_limit))
+    # The JVM reserves far more address space than it uses, so its heap is capped with -Xmx instead
+    return partial(run_process, get_run_command(language, artifact_dir, memory_limit),
+                   cap_address_space=language != 'java')
+
+def open_test_input(test_case: Dict[str, str]) -> BinaryIO:
+    """Open the input of a test case as a file to use as the program's stdin."""
+    if 'input_path' in test_case:
+        return open(test_case['input_path'], 'rb')
+    # Inline input (e.g. from /run_code) is spooled to an unlinked temporary file
+    f = tempfile.TemporaryFile()
+    f.write(test_case['input'].encode())
+    f.seek(0)
+    return f
+
+def open_expected_output(test_case: Dict[str, str]) -> BinaryIO:
+    """Open the expected output of a test case as a file."""
+    if 'output_path' in test_case:
+        return open(test_case['output_path'], 'rb')
+    return io.BytesIO(test_case['output'].encode())
+
+def read_output(fd: int, kill, comparator: Comparator, output_limit: int) -> Optional[str]:
+    """Stream a program's stdout into the comparator.
 
-            # Check memory usage
+    The program is killed as soon as its output is known to be wrong ('WA') or
+    it prints more than output_limit bytes ('OLE'). Returns None if the whole
+    output was read.
+    """
+    total = 0
+    while True:
+        chunk = os.read(fd, CHUNK_SIZE)
+        if not chunk:
+            return None
+        total += len(chunk)
+        if total > output_limit:
+            kill()
+            return 'OLE'
+        comparator.feed(chunk)
+        if comparator.done:
+            kill()
+            return 'WA'
+
+def read_stderr(stderr: BinaryIO) -> str:
+    """Read the start of a program's stderr, which is kept in a temporary file."""
+    stderr.seek(0)
+    return stderr.read(STDERR_LIMIT).decode(errors='replace')
+
+def run_process(command, stdin: BinaryIO, time_limit: int, memory_limit: int, consume_output,
+                cancel=None, cpu=None, slot=None, cap_address_space=True, startup_allowance=0) -> Dict[str, Any]:
+    """Run a command in a fresh process with stdin read from a file and return the raw outcome.
+
+    CPU time and peak memory come from the kernel once the process is reaped;
+    the wall-clock timer only stops programs that sleep or block. The program
+    is started through the launcher of judge.spawn when it can be built, and
+    runs in the sandbox `slot` if one is given. `startup_allowance` seconds
+    are added to both limits for runtimes whose startup is not counted.
+    """
+    cgroup = Cgroup(memory_limit) if USE_CGROUPS else None
+    address_limit = address_space_limit(memory_limit) if cap_address_space and cgroup is None else None
+
+    def limit_child():
+        if cgroup is not None:
+            cgroup.join()
+        set_rlimits(cpu_limit_seconds(time_limit) + startup_allowance, address_limit)
+        if cpu is not None:
+            os.sched_setaffinity(0, {cpu})
+        if slot is not None:
+            slot.isolate()
+
+    launcher_path = launcher.prepare() if os.name == 'posix' else None
+    try:
+        with ExitStack() as stack:
+            stderr = slot.stderr if slot is not None else stack.enter_context(tempfile.TemporaryFile())
+            report = None
+            if launcher_path is not None:
+                report_fd, report_write_fd = os.pipe()
+                report = stack.enter_context(os.fdopen(report_fd))
+                command = [launcher_path, str(report_write_fd), *command]
+            spawn_start = time.monotonic()
             try:
-                memory_used = ps_process.memory_info().rss / 1024  # Convert to KB
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                memory_used = 0  # If we can't get memory info, default to 0
-            
-            if memory_used > memory_limit:
-                return {'status': 'MLE', 'error': 'Memory limit exceeded'}
-
-            if process.returncode != 0:
-                return {
-                    'status': 'RE',
-                    'error': stderr,
-                    'execution_time': execution_time,
-                    'memory_used': memory_used
-                }
+                process = subprocess.Popen(
+                    command,
+                    stdin=stdin,
+                    stdout=subprocess.PIPE,
+                    stderr=stderr,
+                    cwd=slot.path if slot is not None else None,
+                    start_new_session=True,  # Lets us kill anything the program spawns along with it
+                    preexec_fn=limit_child if os.name == 'posix' else None,
+                    pass_fds=(report_write_fd,) if report is not None else ()
+                )
+            finally:
+                if report is not None:
+                    os.close(report_write_fd)
+            # The launcher forks the program into a process group of its own
+            program_pid = int(report.readline() or process.pid) if report is not None else process.pid
+            start_time = time.monotonic()  # The program has been forked, or exec'd without the launcher
 
-            # Compare output
-            expected_output = test_case['output'].strip()
-            actual_output = stdout.strip()
+            def kill():
+                try:
+                    os.killpg(program_pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
 
-            if actual_output == expected_output:
-                return {
-                    'status': 'AC',
-                    'execution_time': execution_time,
-                    'memory_used': memory_used
-                }
+            if cancel is not None:
+                cancel.attach(kill)
+
+            timed_out = threading.Event()
+            def on_timeout():
+                timed_out.set()
+                kill()
+            timer = threading.Timer(wall_time_limit(time_limit) / 1000 + startup_allowance, on_timeout)
+            timer.start()
+            try:
+                output_verdict = consume_output(process.stdout.fileno(), kill)
+                process.stdout.close()
+                outcome = wait_process(process)
+                if report is not None:
+                    # Without the program's own report, what the launcher used is all there is
+                    outcome.update(read_report(report) or {})
+                else:
+                    outcome['memory_shared'] = True
+            finally:
+                timer.cancel()
+            outcome['wall_time'] = (time.monotonic() - start_time) * 1000
+            outcome['spawn_time'] = (start_time - spawn_start) * 1000
+
+            if cgroup is not None:
+                stats = cgroup.stats()
+                if 'memory_used' in stats:
+                    outcome['memory_shared'] = False  # memory.peak only counts the group
+                outcome.update(stats)
+            outcome.update({
+                'timed_out': timed_out.is_set(),
+                'output_verdict': output_verdict,
+                'stderr': read_stderr(stderr)
+            })
+            return outcome
+    finally:
+        if cgroup is not None:
+            cgroup.remove()
+
+def run_java(command, stdin: BinaryIO, time_limit: int, memory_limit: int, consume_output,
+             cancel=None, cpu=None, slot=None) -> Dict[str, Any]:
+    """Run a Java program through the launcher of the Java profile, see judge.javarunner.
+
+    The CPU time the JVM spent before Solution.main is moved from cpu_time
+    to startup_time. The JVM reserves far more address space than it uses,
+    so its heap is capped with -Xmx instead.
+    """
+    outcome = run_process(command, stdin, time_limit, memory_limit, consume_output, cancel=cancel, cpu=cpu,
+                          slot=slot, cap_address_space=False, startup_allowance=STARTUP_ALLOWANCE)
+    startup_time, outcome['stderr'] = split_startup(outcome['stderr'])
+    if startup_time is not None:
+        startup_time = min(startup_time, outcome['cpu_time'])
+        outcome['startup_time'] = startup_time
+        outcome['cpu_time'] -= startup_time
+    return outcome
+
+def run_forkserver(script, stdin: BinaryIO, time_limit: int, memory_limit: int, consume_output,
+                   cancel=None, cpu=None, slot=None) -> Dict[str, Any]:
+    """Run a Python solution in a child of the forkserver with the same limits as run_process."""
+    cgroup = Cgroup(memory_limit) if USE_CGROUPS else None
+    limits = {
+        'cpu_seconds': cpu_limit_seconds(time_limit),
+        'address_limit': address_space_limit(memory_limit) if cgroup is None else None,
+        'cgroup': cgroup.path if cgroup is not None else None
+    }
+    try:
+        outcome = get_forkserver().run(script, stdin, wall_time_limit(time_limit), limits, consume_output,
+                                       cancel=cancel, cpu=cpu, sandbox=slot.sandbox() if slot is not None else None,
+                                       stderr=slot.stderr if slot is not None else None)
+        if cgroup is not None:
+            outcome.update(cgroup.stats())
+        return outcome
+    finally:
+        if cgroup is not None:
+            cgroup.remove()
+
+def wait_process(process: subprocess.Popen) -> Dict[str, Any]:
+    """Reap a process and return its exit code, CPU time and peak memory."""
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return {'returncode': process.returncode, 'cpu_time': 0, 'memory_used': 0}
+
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        'returncode': process.returncode,
+        'cpu_time': (rusage.ru_utime + rusage.ru_stime) * 1000,
+        'memory_used': rusage.ru_maxrss  # KB on Linux
+    }
+
+def compile_checker(checker, stack: Optional[ExitStack] = None):
+    """Compile a custom checker once, reusing the compile cache; returns (artifact_dir, error)."""
+    if checker.get('language') not in COMPILE_FLAGS or not checker.get('source'):
+        return None, 'A custom checker needs a language and source'
+    return compile_code(checker['source'], checker['language'], stack)
+
+def run_checker(key, command, test_case: Dict[str, str], output_path: str):
+    """Ask a warm process of a custom checker whether an output is accepted."""
+    with ExitStack() as stack:
+        paths = []
+        for field in ('input', 'output'):
+            if f'{field}_path' in test_case:
+                paths.append(test_case[f'{field}_path'])
             else:
-                return {
-                    'status': 'WA',
-                    'expected': expected_output,
-                    'got': actual_output,
-                    'execution_time': execution_time,
-                    'memory_used': memory_used
-                }
+                # Inline test data (e.g. from /run_code) is written out for the checker
+                f = stack.enter_context(tempfile.NamedTemporaryFile(prefix='cms-test-'))
+                f.write(test_case[field].encode())
+                f.flush()
+                paths.append(f.name)
+        return checker_pool.check(key, command, paths[0], output_path, paths[1])
+
+def comparator_factory(checker, stack: Optional[ExitStack] = None):
+    """Return a function making the comparator of a test for a problem's checker spec.
+
+    None uses the exact match after stripping whitespace. Built-in checkers are
+    {'type': 'tokens'} and {'type': 'float', 'abs_eps': ..., 'rel_eps': ...};
+    {'type': 'custom', 'language': ..., 'source': ...} runs a checker program,
+    kept in the compile cache until `stack` closes.
+    """
+    if not checker or checker.get('type') != 'custom':
+        builtin_comparator(checker, io.BytesIO())  # Unknown types fail before anything runs
+        return lambda test_case, expected: builtin_comparator(checker, expected)
+
+    artifact_dir, error = compile_checker(checker, stack)
+    if error is not None:
+        raise CheckerError(f"Checker does not compile: {error}")
+    command = get_run_command(checker['language'], artifact_dir, CHECKER_MEMORY_LIMIT)
+    return lambda test_case, expected: CustomComparator(expected, partial(run_checker, artifact_dir, command, test_case))
+
+def run_code(runner, test_case: Dict[str, str], time_limit: int, memory_limit: int, cancel=None, cpu=None,
+             make_comparator=None, slot=None) -> Dict[str, Any]:
+    """Run a compiled program against a test case and return the result."""
+    make_comparator = make_comparator or comparator_factory(None)
+    try:
+        with open_test_input(test_case) as stdin, open_expected_output(test_case) as expected:
+            comparator = make_comparator(test_case, expected)
+            consume_output = partial(read_output, comparator=comparator, output_limit=OUTPUT_LIMIT)
+            outcome = runner(stdin, time_limit, memory_limit, consume_output, cancel=cancel, cpu=cpu, slot=slot)
+            result = evaluate(outcome, comparator, time_limit, memory_limit, cancel)
+    except CheckerError:
+        # A broken checker is the judge's fault, not the program's
+        raise
+    except Exception as e:
+        return {'status': 'RE', 'error': str(e)}
+
+    if result['status'] != 'skip':
+        # Where the time of this test went, in milliseconds
+        result['phases'] = {
+            'spawn': outcome.get('spawn_time', 0) + outcome.get('startup_time', 0),
+            'execute': outcome['wall_time'],
+            'compare': comparator.compare_time
+        }
+    return result
+
+def evaluate(outcome: Dict[str, Any], comparator: Comparator, time_limit: int, memory_limit: int,
+             cancel=None) -> Dict[str, Any]:
+    """Turn the raw outcome of a run into a verdict."""
+    if cancel is not None and cancel.cancelled:
+        return {'status': 'skip'}
+
+    # Execution time is CPU time, so it does not grow when the judge machine is busy
+    result = {
+        'execution_time': outcome['cpu_time'],
+        'cpu_time': outcome['cpu_time'],
+        'wall_time': outcome['wall_time'],
+        'memory_used': outcome['memory_used']
+    }
+    # Interpreter startup is reported on its own when the runner can measure it
+    if 'startup_time' in outcome:
+        result['startup_time'] = outcome['startup_time']
+
+    if outcome['output_verdict'] == 'OLE':
+        return {'status': 'OLE', 'error': 'Output limit exceeded', **result}
+
+    # A program stopped on its first wrong byte is WA whatever happened to it afterwards
+    if outcome['output_verdict'] != 'WA':
+        if outcome['timed_out']:
+            return {'status': 'TLE', 'error': 'Wall time limit exceeded', **result}
+
+        if outcome['cpu_time'] > time_limit or outcome['returncode'] == CPU_LIMIT_EXIT_CODE:
+            return {'status': 'TLE', 'error': 'Time limit exceeded', **result}
+
+        # A peak that includes the judge's own memory says nothing about the program
+        over_memory = outcome['memory_used'] > memory_limit * 1024 and not outcome.get('memory_shared')  # memory_limit is in MB
+        if over_memory or outcome.get('oom_killed'):
+            return {'status': 'MLE', 'error': 'Memory limit exceeded', **result}
 
-        except subprocess.TimeoutExpired:
-            process.kill()
-            return {'status': 'TLE', 'error': 'Time limit exceeded'}
-        except Exception as e:
-            return {'status': 'RE', 'error': str(e)}
+        # An allocation refused by the address space cap shows up as a crash
+        if outcome['returncode'] != 0 and any(marker in outcome['stderr'] for marker in OUT_OF_MEMORY_MARKERS):
+            return {'status': 'MLE', 'error': 'Memory limit exceeded', **result}
+
+        if outcome['returncode'] != 0:
+            return {'status': 'RE', 'error': outcome['stderr'], **result}
+
+        if comparator.finish():
+            return {'status': 'AC', **result}
+
+    expected_output, actual_output = comparator.excerpts()
+    result = {
+        'status': 'WA',
+        'expected': expected_output,
+        'got': actual_output,
+        **result
+    }
+    if comparator.message:
+        result['error'] = comparator.message
+    return result
+
+def test_key(test_case: Dict[str, Any]) -> str:
+    """Identify a test by its input and expected output, so copies of it in several batches run once."""
+    if 'pair_hash' in test_case:
+        return test_case['pair_hash']
+    if 'input_hash' in test_case:
+        # Problems created before pair hashes were stored
+        return pair_hash(test_case['input_hash'], test_case['output_hash'])
+    if 'input_path' in test_case:
+        return f"{test_case['input_path']}\0{test_case['output_path']}"
+    return hashlib.sha256(test_case['input'].encode() + b'\0' + test_case['output'].encode()).hexdigest()
+
+def run_tests(runner, batches, time_limit, memory_limit, parallelism, pin_cpus, make_comparator=None, slots=None):
+    """Run every test case of every batch, up to `parallelism` at a time, each in one of `slots`.
+
+    Batches run concurrently. Inside a batch, the first non-AC result cancels
+    the tests after it, so the results match a sequential run where every test
+    after the first failure is skipped. A test repeated in several batches
+    runs once and its result is shared; it is only skipped or cancelled once
+    every copy of it comes after a failure.
+    """
+    lock = threading.Lock()
+    cancel_from = [len(batch['test_cases']) for batch in batches]
+    copies = {}  # Test key -> (batch index, test index) of every copy
+    tests = {}
+    for b, batch in enumerate(batches):
+        for i, test_case in enumerate(batch['test_cases']):
+            key = test_key(test_case)
+            copies.setdefault(key, []).append((b, i))
+            tests.setdefault(key, test_case)
+    tokens = {}
+    free_slots = queue.Queue()
+    for slot in slots or [None] * max(1, parallelism):
+        free_slots.put(slot)
+
+    def needed(key):
+        return any(i <= cancel_from[b] for b, i in copies[key])
+
+    def run_test(key):
+        with lock:
+            if not needed(key):
+                return {'status': 'skip'}
+            token = tokens[key] = CancelToken()
+
+        slot = free_slots.get()
+        try:
+            if pin_cpus:
+                with cpu_pool.lease() as cpu:
+                    result = run_code(runner, tests[key], time_limit, memory_limit, cancel=token, cpu=cpu,
+                                      make_comparator=make_comparator, slot=slot)
+            else:
+                result = run_code(runner, tests[key], time_limit, memory_limit, cancel=token,
+                                  make_comparator=make_comparator, slot=slot)
+        finally:
+            # Nothing a test leaves behind is seen by the next one
+            if slot is not None:
+                slot.reset()
+            free_slots.put(slot)
+
+        if result['status'] not in ('AC', 'skip'):
+            with lock:
+                for b, i in copies[key]:
+                    cancel_from[b] = min(cancel_from[b], i)
+                to_cancel = [other for other_key, other in tokens.items() if other_key != key and not needed(other_key)]
+            for other in to_cancel:
+                other.cancel()
+        return result
+
+    with ThreadPoolExecutor(max_workers=free_slots.qsize()) as executor:
+        futures = {key: executor.submit(run_test, key) for key in copies}
+        results = {key: future.result() for key, future in futures.items()}
+    return [[results[test_key(test_case)] for test_case in batch['test_cases']] for batch in batches]
+
+def judge_submission(code, language, batches, time_limit, memory_limit, is_run_code=False,
+                     parallelism=None, pin_cpus=None, checker=None):
+    """Judge a submission against batches of test cases, comparing outputs with the problem's checker."""
+    if parallelism is None:
+        parallelism = PARALLELISM
+    if pin_cpus is None:
+        pin_cpus = PIN_CPUS
 
-def judge_submission(code, language, batches, time_limit, memory_limit, is_run_code=False):
-    """Judge a submission against batches of test cases."""
     total_earned = 0
     max_execution_time = 0
     max_memory_used = 0
     batch_results = []
     all_passed = True
 
-    # Run against each batch
-    for batch in batches:
+    # Compile once for the whole submission; the artifacts stay in the cache until the tests are done
+    with ExitStack() as stack:
+        start_time = time.monotonic()
+        artifact_dir, compile_error = compile_code(code, language, stack)
+        compile_time = (time.monotonic() - start_time) * 1000
+        if compile_error is not None:
+            test_results = [[{'status': 'CE', 'error': compile_error} for _ in batch['test_cases']] for batch in batches]
+        else:
+            runner = get_runner(language, artifact_dir, memory_limit)
+            make_comparator = comparator_factory(checker, stack)
+            with sandbox_pool.lease(parallelism) as slots:
+                test_results = run_tests(runner, batches, time_limit, memory_limit, parallelism, pin_cpus,
+                                         make_comparator, slots)
+
+    # Collect the results of each batch
+    for batch, results in zip(batches, test_results):
         batch_points = batch['points']
-        test_cases = batch['test_cases']
         batch_passed = True
         batch_execution_time = 0
         batch_memory_used = 0
@@ -150,16 +577,16 @@ def judge_submission(code, language, batches, time_limit, memory_limit, is_run_c
         current_batch_result = {
             'status': '',
             'batch_points': 0,
+            'cpu_time_limit': time_limit,
+            'wall_time_limit': wall_time_limit(time_limit),
             'test_case_results': []
         }
 
-        # Run against each test case in the batch
-        for test_case in test_cases:
+        # Every test case after the first failure in the batch is skipped
+        for result in results:
             if not batch_passed:
                 current_batch_result['test_case_results'].append({'status': 'skip'})
                 continue
-                
-            result = run_code(code, language, test_case, time_limit, memory_limit)
             
             if result['status'] != 'AC':
                 batch_passed = False
@@ -170,20 +597,24 @@ def judge_submission(code, language, batches, time_limit, memory_limit, is_run_c
                 time_taken = round(result.get('execution_time', 0), 2) if error != 'TLE' else f">{time_limit:.2f}"
                 memory_taken = round(result.get('memory_used', 0), 2) if error != 'MLE' else f">{memory_limit:.2f}"
                 
-                current_batch_result['test_case_results'].append({
+                test_case_result = {
                     'status': result['status'],
                     'error': result.get('error', ''),
                     'expected': result.get('expected', ''),
                     'got': result.get('got', ''),
                     'execution_time': time_taken,
                     'memory_used': memory_taken
-                })
+                }
             else:
-                current_batch_result['test_case_results'].append({
+                test_case_result = {
                     'status': 'AC',
                     'execution_time': round(result.get('execution_time', 0), 2),
                     'memory_used': result.get('memory_used', 0)
-                })
+                }
+            for key in ('cpu_time', 'wall_time', 'startup_time'):
+                if key in result:
+                    test_case_result[key] = round(result[key], 2)
+            current_batch_result['test_case_results'].append(test_case_result)
             
             batch_execution_time = max(batch_execution_time, result.get('execution_time', 0))
             batch_memory_used = max(batch_memory_used, result.get('memory_used', 0))
@@ -203,12 +634,22 @@ def judge_submission(code, language, batches, time_limit, memory_limit, is_run_c
     # For contest submissions, use total_earned as before
     status = 'AC' if (is_run_code and all_passed) or (not is_run_code and total_earned > 0) else 'WA'
     
+    # Per-phase breakdown in milliseconds, including tests that ran but are shown as skipped.
+    # A shared result is the same dict in every batch, so each run is only counted once
+    runs = {id(result): result for results in test_results for result in results if 'phases' in result}
+    timings = {
+        'compile': round(compile_time, 2),
+        'tests': [{phase: round(value, 2) for phase, value in result['phases'].items()} for result in runs.values()],
+        'total': round((time.monotonic() - start_time) * 1000, 2)
+    }
+
     return {
         'status': status,
         'points_earned': total_earned,
         'execution_time': round(max_execution_time, 2),
         'memory_used': max_memory_used,
-        'batch_results': batch_results
+        'batch_results': batch_results,
+        'timings': timings
     }
 
 def main():
@@ -0,0 +1,109 @@
+import math
+import os
+import signal
+import tempfile
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Wall-clock time is only a backstop against sleeping or blocked programs; verdicts use CPU time
+WALL_TIME_FACTOR = float(os.environ.get('JUDGE_WALL_TIME_FACTOR', 3))
+
+# A delegated cgroup v2 directory the judge may create child groups in
+CGROUP_ROOT = os.environ.get('JUDGE_CGROUP_ROOT')
+
+# Exit code of a program killed for going over RLIMIT_CPU
+CPU_LIMIT_EXIT_CODE = -signal.SIGXCPU if hasattr(signal, 'SIGXCPU') else None
+
+# Messages a program prints when an allocation fails under the address space cap
+OUT_OF_MEMORY_MARKERS = ('MemoryError', 'std::bad_alloc', 'java.lang.OutOfMemoryError')
+
+
+def wall_time_limit(time_limit: int) -> int:
+    """Wall-clock limit in milliseconds for a CPU time limit in milliseconds."""
+    return int(time_limit * WALL_TIME_FACTOR)
+
+
+def address_space_limit(memory_limit: int) -> int:
+    """Address space cap in bytes for a memory limit in MB.
+
+    Address space over-counts what a program really uses, so the cap only stops
+    runaway allocations; MLE itself is decided from the peak RSS.
+    """
+    return (memory_limit * 2 + 64) * 1024 * 1024
+
+
+def cpu_limit_seconds(time_limit: int) -> int:
+    """RLIMIT_CPU in seconds for a time limit in milliseconds.
+
+    The kernel sends SIGXCPU at this soft limit, which stops busy programs
+    without the judge having to poll their CPU time.
+    """
+    return math.ceil(time_limit / 1000)
+
+
+def set_rlimits(cpu_seconds: int, address_limit: Optional[int]):
+    """Apply the CPU and address space limits to the calling process; runs in the child before exec."""
+    if resource is None:
+        return
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if address_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (address_limit, address_limit))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def cgroups_available() -> bool:
+    """Whether CGROUP_ROOT is a writable cgroup v2 directory with the memory controller enabled."""
+    if not CGROUP_ROOT:
+        return False
+    try:
+        with open(os.path.join(CGROUP_ROOT, 'cgroup.subtree_control')) as f:
+            return 'memory' in f.read().split() and os.access(CGROUP_ROOT, os.W_OK)
+    except OSError:
+        return False
+
+
+class Cgroup:
+    """A cgroup v2 group holding a single run, with a hard memory limit."""
+
+    def __init__(self, memory_limit: int):
+        self.path = tempfile.mkdtemp(prefix='run-', dir=CGROUP_ROOT)
+        self._write('memory.max', str(memory_limit * 1024 * 1024))
+        try:
+            self._write('memory.swap.max', '0')
+        except OSError:
+            pass  # Swap accounting is disabled
+
+    def _write(self, name, value):
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.write(value)
+
+    def _read(self, name) -> Dict[str, int]:
+        with open(os.path.join(self.path, name)) as f:
+            return {key: int(value) for key, value in (line.split() for line in f)}
+
+    def join(self):
+        """Move the calling process into the group."""
+        self._write('cgroup.procs', '0')
+
+    def stats(self) -> Dict[str, Any]:
+        """Read the CPU time, peak memory and OOM kills of the finished run."""
+        stats = {
+            'cpu_time': self._read('cpu.stat')['usage_usec'] / 1000,
+            'oom_killed': self._read('memory.events').get('oom_kill', 0) > 0
+        }
+        try:
+            with open(os.path.join(self.path, 'memory.peak')) as f:
+                stats['memory_used'] = int(f.read()) / 1024  # KB
+        except FileNotFoundError:
+            pass  # Kernels before 5.19 only have the rusage peak
+        return stats
+
+    def remove(self):
+        try:
+            os.rmdir(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,212 @@
+"""Problem packages: a zip file or directory holding a problem and its tests.
+
+    problem.json        title, difficulty, time_limit, memory_limit, optional checker,
+                        and "batches": [{"points": 10, "samples": ["1"]}, ...] in batch order
+    statement.md        the description, unless problem.json has one
+    batch1/1.in         input of test 1 of the first batch
+    batch1/1.out        its expected output
+    batch2/...
+
+Test files are streamed into the test data store one at a time, so the size
+of a package is only bounded by the disk. A custom checker may name a source
+file in the package with "file" instead of giving its "source".
+"""
+import json
+import os
+import re
+import zipfile
+from typing import Any, BinaryIO, Dict, List
+
+from judge.testdata import TestDataStore, pair_hash
+
+METADATA_FILE = 'problem.json'
+STATEMENT_FILE = 'statement.md'
+METADATA_LIMIT = 1024 * 1024  # problem.json, statement and checker source are read into memory
+
+BATCH_DIR = re.compile(r'^batch(\d+)$')
+
+
+class PackageError(ValueError):
+    """Raised when a package is malformed; the message says what to fix."""
+
+
+def natural_key(name: str):
+    """Sort key putting test 2 before test 10."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+class ZipPackage:
+    """A package in a zip file, read member by member."""
+
+    def __init__(self, path: str):
+        try:
+            self.zip = zipfile.ZipFile(path)
+        except zipfile.BadZipFile:
+            raise PackageError('Not a zip file')
+        # Finder adds resource forks under __MACOSX/
+        members = [info for info in self.zip.infolist() if not info.is_dir() and not info.filename.startswith('__MACOSX/')]
+        # Packages zipped with their top directory are read from inside it
+        tops = {info.filename.split('/', 1)[0] for info in members}
+        self.prefix = ''
+        if len(tops) == 1 and all('/' in info.filename for info in members):
+            self.prefix = tops.pop() + '/'
+        self.members = {info.filename[len(self.prefix):]: info for info in members}
+
+    def names(self) -> List[str]:
+        return list(self.members)
+
+    def size(self, name: str) -> int:
+        return self.members[name].file_size
+
+    def open(self, name: str) -> BinaryIO:
+        return self.zip.open(self.members[name])
+
+    def close(self):
+        self.zip.close()
+
+
+class DirectoryPackage:
+    """A package unpacked in a directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def names(self) -> List[str]:
+        names = []
+        for directory, _, files in os.walk(self.root):
+            for file_name in files:
+                names.append(os.path.relpath(os.path.join(directory, file_name), self.root).replace(os.sep, '/'))
+        return names
+
+    def size(self, name: str) -> int:
+        return os.path.getsize(os.path.join(self.root, name))
+
+    def open(self, name: str) -> BinaryIO:
+        return open(os.path.join(self.root, name), 'rb')
+
+    def close(self):
+        pass
+
+
+def open_package(path: str):
+    return DirectoryPackage(path) if os.path.isdir(path) else ZipPackage(path)
+
+
+def read_small(package, name: str) -> str:
+    if package.size(name) > METADATA_LIMIT:
+        raise PackageError(f'{name} is larger than {METADATA_LIMIT // 1024} KB')
+    with package.open(name) as f:
+        try:
+            return f.read().decode()
+        except UnicodeDecodeError:
+            raise PackageError(f'{name} is not UTF-8 text')
+
+
+def package_tests(package) -> List[List[Dict[str, str]]]:
+    """Pair up the .in and .out files of every batch directory, in batch and test order."""
+    batches = {}
+    for name in package.names():
+        parts = name.split('/')
+        if len(parts) != 2 or not BATCH_DIR.match(parts[0]):
+            continue
+        test_name, ext = os.path.splitext(parts[1])
+        if ext not in ('.in', '.out'):
+            raise PackageError(f'Unexpected file {name}, tests must end in .in or .out')
+        batches.setdefault(int(BATCH_DIR.match(parts[0]).group(1)), {}).setdefault(test_name, {})[ext] = name
+
+    if not batches:
+        raise PackageError('The package has no batch directories (batch1/, batch2/, ...)')
+    if sorted(batches) != list(range(1, len(batches) + 1)):
+        raise PackageError('Batch directories must be numbered batch1, batch2, ... without gaps')
+
+    result = []
+    for number in sorted(batches):
+        tests = []
+        for test_name in sorted(batches[number], key=natural_key):
+            files = batches[number][test_name]
+            if '.in' not in files or '.out' not in files:
+                raise PackageError(f'batch{number}/{test_name} needs both a .in and a .out file')
+            tests.append({'name': test_name, 'input': files['.in'], 'output': files['.out']})
+        result.append(tests)
+    return result
+
+
+def load_metadata(package) -> Dict[str, Any]:
+    """Read and check problem.json, filling in the statement and checker source from their files."""
+    if METADATA_FILE not in package.names():
+        raise PackageError(f'The package has no {METADATA_FILE}')
+    try:
+        metadata = json.loads(read_small(package, METADATA_FILE))
+    except json.JSONDecodeError as e:
+        raise PackageError(f'{METADATA_FILE} is not valid JSON: {e}')
+    if not isinstance(metadata, dict):
+        raise PackageError(f'{METADATA_FILE} must hold an object')
+
+    if 'description' not in metadata and STATEMENT_FILE in package.names():
+        metadata['description'] = read_small(package, STATEMENT_FILE)
+    metadata.setdefault('difficulty', 'Medium')
+    for field in ('title', 'description', 'time_limit', 'memory_limit', 'batches'):
+        if field not in metadata:
+            raise PackageError(f'{METADATA_FILE} is missing {field}')
+    for field in ('time_limit', 'memory_limit'):
+        if not isinstance(metadata[field], int) or metadata[field] <= 0:
+            raise PackageError(f'{field} must be a positive integer')
+    if not isinstance(metadata['batches'], list) or not all(
+            isinstance(batch, dict) and isinstance(batch.get('points'), int) for batch in metadata['batches']):
+        raise PackageError('batches must be a list of objects with integer points')
+
+    checker = metadata.get('checker')
+    if isinstance(checker, dict) and 'file' in checker:
+        if checker['file'] not in package.names():
+            raise PackageError(f"Checker file {checker['file']} is not in the package")
+        checker = dict(checker, source=read_small(package, checker['file']))
+        del checker['file']
+        metadata['checker'] = checker
+    return metadata
+
+
+def import_package(path: str, store: TestDataStore, max_bytes: int) -> Dict[str, Any]:
+    """Check a package and stream its tests into the store.
+
+    Returns the problem metadata with `batches` in the Problem.batches format.
+    Raises PackageError if the package is malformed or its tests add up to
+    more than `max_bytes`; the layout and sizes are checked before any test
+    is stored.
+    """
+    package = open_package(path)
+    try:
+        metadata = load_metadata(package)
+        tests = package_tests(package)
+        if len(tests) != len(metadata['batches']):
+            raise PackageError(f"{METADATA_FILE} lists {len(metadata['batches'])} batches "
+                               f"but the package has {len(tests)} batch directories")
+        total = sum(package.size(test[field]) for batch in tests for test in batch for field in ('input', 'output'))
+        if total > max_bytes:
+            raise PackageError(f'The tests add up to {total // (1024 * 1024)} MB, '
+                               f'more than the {max_bytes // (1024 * 1024)} MB allowed')
+
+        batches = []
+        for meta, batch_tests in zip(metadata['batches'], tests):
+            samples = set(map(str, meta.get('samples', [])))
+            test_cases = []
+            for test in batch_tests:
+                try:
+                    with package.open(test['input']) as f:
+                        input_hash, input_size = store.put_stream(f)
+                    with package.open(test['output']) as f:
+                        output_hash, output_size = store.put_stream(f)
+                except zipfile.BadZipFile as e:
+                    raise PackageError(f"Test {test['input']} is corrupt: {e}")
+                test_cases.append({
+                    'input_hash': input_hash,
+                    'input_size': input_size,
+                    'output_hash': output_hash,
+                    'output_size': output_size,
+                    'pair_hash': pair_hash(input_hash, output_hash),
+                    'sample': test['name'] in samples
+                })
+            batches.append({'points': meta['points'], 'test_cases': test_cases})
+        metadata['batches'] = batches
+        return metadata
+    finally:
+        package.close()
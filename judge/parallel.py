@@ -0,0 +1,49 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class CancelToken:
+    """Lets one test cancel another by killing its running process."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._kill = None
+        self._lock = threading.Lock()
+
+    def attach(self, kill):
+        """Register how to kill the running process, killing it at once if already cancelled."""
+        with self._lock:
+            self._kill = kill
+            cancelled = self.cancelled
+        if cancelled:
+            kill()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            kill = self._kill
+        if kill is not None:
+            kill()
+
+
+class CpuPool:
+    """Hands out dedicated CPUs so parallel tests do not share a core."""
+
+    def __init__(self):
+        self.cpus = queue.Queue()
+        for cpu in sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []:
+            self.cpus.put(cpu)
+
+    @contextmanager
+    def lease(self):
+        """Lease a CPU for the duration of one test, waiting if all are in use."""
+        if not hasattr(os, 'sched_setaffinity'):
+            yield None
+            return
+        cpu = self.cpus.get()
+        try:
+            yield cpu
+        finally:
+            self.cpus.put(cpu)
@@ -0,0 +1,138 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+# Priority classes, lower runs first
+PRIORITY_SUBMIT = 0
+PRIORITY_RUN = 1
+PRIORITY_REJUDGE = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_SUBMIT: 'submit',
+    PRIORITY_RUN: 'run',
+    PRIORITY_REJUDGE: 'rejudge'
+}
+
+
+class QueueFull(Exception):
+    """Raised when a job is refused because its queue is full."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JudgePool:
+    """A pool of judge worker threads fed by a priority and fair-share scheduler.
+
+    Jobs are taken by priority class first. Within a class users take turns,
+    so one user with many queued jobs does not hold up the others, and no user
+    has more than `user_limit` jobs running at once. `class_limits` caps the
+    workers a class may occupy, `queue_limits` and `user_queue_limits` cap the
+    jobs a class may have waiting, in total and per user.
+    """
+
+    def __init__(self, workers: int = 4, user_limit: Optional[int] = None,
+                 class_limits: Optional[Dict[int, int]] = None, queue_limits: Optional[Dict[int, int]] = None,
+                 user_queue_limits: Optional[Dict[int, int]] = None):
+        self.workers = max(1, workers)
+        self.user_limit = user_limit or self.workers
+        self.class_limits = class_limits or {}
+        self.queue_limits = queue_limits or {}
+        self.user_queue_limits = user_queue_limits or {}
+        self.busy = 0
+        self._queues = {priority: OrderedDict() for priority in PRIORITY_NAMES}  # priority -> user -> jobs
+        self._queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self._running = {priority: 0 for priority in PRIORITY_NAMES}
+        self._running_per_user = {}
+        self._job_time = 1.0  # Moving average of seconds per job, for retry hints
+        self._lock = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads if they are not already running."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'judge-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn: Callable, *args, priority: int = PRIORITY_SUBMIT, user: Any = None) -> Future:
+        """Queue `fn(*args)` for a worker and return a future of its result; raises QueueFull."""
+        self.start()
+        future = Future()
+        with self._lock:
+            jobs = self._queues[priority].get(user)
+            queued_by_user = len(jobs) if jobs else 0
+            if self._queued[priority] >= self.queue_limits.get(priority, math.inf):
+                raise QueueFull('The judge is busy, please try again shortly', self.retry_after(priority))
+            if queued_by_user >= self.user_queue_limits.get(priority, math.inf):
+                raise QueueFull('You already have a job waiting for the judge', self.retry_after(priority))
+            self._queues[priority].setdefault(user, deque()).append((fn, args, future))
+            self._queued[priority] += 1
+            self._lock.notify()
+        return future
+
+    def retry_after(self, priority: int) -> int:
+        """Seconds until the jobs ahead in a class are likely done."""
+        ahead = sum(self._queued[p] for p in PRIORITY_NAMES if p <= priority) + 1
+        return max(1, math.ceil(ahead * self._job_time / self.workers))
+
+    def _next(self):
+        # Highest class with a user below their running limit, users in turn within a class
+        for priority, users in self._queues.items():
+            if self._running[priority] >= self.class_limits.get(priority, self.workers):
+                continue
+            for user, jobs in users.items():
+                if self._running_per_user.get(user, 0) >= self.user_limit:
+                    continue
+                job = jobs.popleft()
+                if jobs:
+                    users.move_to_end(user)
+                else:
+                    del users[user]
+                return priority, user, job
+        return None
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while (picked := self._next()) is None:
+                    self._lock.wait()
+                priority, user, (fn, args, future) = picked
+                self._queued[priority] -= 1
+                self._running[priority] += 1
+                self._running_per_user[user] = self._running_per_user.get(user, 0) + 1
+                self.busy += 1
+            start_time = time.monotonic()
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(fn(*args))
+            except Exception as e:
+                print(f"Judge worker error: {str(e)}")
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._job_time = 0.8 * self._job_time + 0.2 * (time.monotonic() - start_time)
+                    self.busy -= 1
+                    self._running[priority] -= 1
+                    self._running_per_user[user] -= 1
+                    if not self._running_per_user[user]:
+                        del self._running_per_user[user]
+                    # A freed user or class slot may unblock a waiting job
+                    self._lock.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the worker count, busy workers and queue depth, in total and per priority class."""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'busy': self.busy,
+                'queue_depth': sum(self._queued.values()),
+                'queued': {PRIORITY_NAMES[priority]: count for priority, count in self._queued.items()}
+            }
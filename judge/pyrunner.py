@@ -0,0 +1,278 @@
+"""Forkserver for Python submissions.
+
+A warm zygote interpreter with the common stdlib modules already imported
+forks a clean child per test case, so each run skips interpreter startup.
+
+The zygote is started with `python pyrunner.py <socket_path>`. For every test
+the judge connects to the socket and sends a JSON request together with the
+stdin/stdout/stderr file descriptors. The zygote forks a supervisor which
+forks the runner, reports the runner's pid, waits for it with wait4() and
+reports the exit code, resource usage and timings.
+"""
+import atexit
+import ctypes
+import gc
+import importlib
+import json
+import os
+import random
+import resource
+import runpy
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import ExitStack
+from functools import partial
+
+STDERR_LIMIT = 64 * 1024  # Only the start of stderr is kept
+
+# Imported by the zygote so children start with them warm
+PRELOADED_MODULES = ['collections', 'heapq', 'bisect', 'math', 'itertools', 'functools', 're', 'string']
+
+CLONE_NEWNET = 0x40000000  # Same as judge.sandbox, which the zygote does not import
+
+
+def _send(conn, message):
+    conn.sendall(json.dumps(message).encode() + b'\n')
+
+
+def _run_solution(request, fds, start_w):
+    """Runner child: redirect stdio and execute the solution as __main__."""
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = sys.__stdin__ = open(0, 'r', closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, 'w', closefd=False)
+    sys.stderr = sys.__stderr__ = open(2, 'w', closefd=False)
+
+    script = request['script']
+    if request.get('cwd'):
+        os.chdir(request['cwd'])
+    sys.argv = [script]
+    sys.path[0] = os.path.dirname(script)
+    random.seed()  # Do not share the zygote's random state between runs
+    atexit._clear()  # Handlers of the zygote are not the solution's
+    if request.get('cpu') is not None:
+        os.sched_setaffinity(0, {request['cpu']})
+
+    limits = request['limits']
+    if limits.get('cgroup'):
+        with open(os.path.join(limits['cgroup'], 'cgroup.procs'), 'w') as f:
+            f.write('0')
+    resource.setrlimit(resource.RLIMIT_CPU, (limits['cpu_seconds'], limits['cpu_seconds'] + 1))
+    if limits.get('address_limit'):
+        resource.setrlimit(resource.RLIMIT_AS, (limits['address_limit'], limits['address_limit']))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    # Sandbox slot isolation comes last, joining the cgroup needs the zygote's rights
+    if request.get('unshare_net'):
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.unshare(CLONE_NEWNET) != 0:
+            raise OSError(ctypes.get_errno(), 'unshare(CLONE_NEWNET) failed')
+    if request.get('uid') is not None:
+        os.setgroups([])
+        os.setgid(request['uid'])
+        os.setuid(request['uid'])
+
+    os.write(start_w, struct.pack('d', time.monotonic()))
+    os.close(start_w)
+
+    exit_code = 0
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Hide the runner's own frames so the traceback matches a plain `python solution.py`
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        exit_code = 1
+
+    # Finish like the interpreter does: wait for non-daemon threads, then run the atexit handlers
+    try:
+        threading._shutdown()
+    except BaseException as e:
+        traceback.print_exception(type(e), e, e.__traceback__)
+        exit_code = exit_code or 1
+    atexit._run_exitfuncs()
+
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except Exception:
+        exit_code = exit_code or 120
+    os._exit(exit_code)
+
+
+def _supervise(conn):
+    """Supervisor child: fork the runner, wait for it and report the outcome."""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    message, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+    request = json.loads(message)
+    start_r, start_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        os.close(start_r)
+        _run_solution(request, fds, start_w)
+
+    os.close(start_w)
+    for fd in fds:
+        os.close(fd)
+    _send(conn, {'pid': pid})
+
+    _, status, rusage = os.wait4(pid, 0)
+    end_time = time.monotonic()
+    started = os.read(start_r, 8)
+    start_time = struct.unpack('d', started)[0] if len(started) == 8 else end_time
+
+    _send(conn, {
+        'returncode': os.waitstatus_to_exitcode(status),
+        'startup_time': max(0.0, start_time - request['sent_at']) * 1000,
+        'wall_time': (end_time - start_time) * 1000,
+        'cpu_time': (rusage.ru_utime + rusage.ru_stime) * 1000,
+        'memory_used': rusage.ru_maxrss  # KB on Linux
+    })
+
+
+def serve(socket_path):
+    """Zygote loop: fork a supervisor for every connection until stdin closes."""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Supervisors are reaped automatically
+
+    for name in PRELOADED_MODULES:
+        importlib.import_module(name)
+    gc.collect()
+    gc.freeze()  # Keep the warm heap shared copy-on-write with the children
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    selector.register(sys.stdin, selectors.EVENT_READ)
+    print('ready', flush=True)
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is sys.stdin:
+                # The judge closed our stdin, so it has exited
+                if not sys.stdin.buffer.read1(1024):
+                    server.close()
+                    os.unlink(socket_path)
+                    return
+                continue
+
+            conn, _ = server.accept()
+            if os.fork() == 0:
+                server.close()
+                try:
+                    _supervise(conn)
+                finally:
+                    os._exit(0)
+            conn.close()
+
+
+class PythonForkServer:
+    """Client side of the forkserver, owned by the judge process."""
+
+    def __init__(self, python='python'):
+        self.python = python
+        self.process = None
+        self.socket_path = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the zygote if it is not running."""
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                return
+            self.socket_path = os.path.join(tempfile.mkdtemp(prefix='cms-pyrunner-'), 'zygote.sock')
+            self.process = subprocess.Popen(
+                [self.python, os.path.abspath(__file__), self.socket_path],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True
+            )
+            if self.process.stdout.readline().strip() != 'ready':
+                raise RuntimeError('Python forkserver failed to start')
+
+    @staticmethod
+    def _kill(pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def run(self, script, stdin, wall_limit, limits, consume_output, cancel=None, cpu=None, sandbox=None, stderr=None):
+        """Run a solution script with stdin read from a file and return the raw outcome.
+
+        `limits` holds the runner's RLIMIT_CPU in seconds, its address space cap
+        and optionally a cgroup to join. The program's stdout is a pipe handed to
+        consume_output(fd, kill). `sandbox` gives the working directory, user id
+        and network isolation of a sandbox slot, and `stderr` its stderr file.
+        """
+        self.start()
+        read_fd, write_fd = os.pipe()
+        with ExitStack() as stack:
+            if stderr is None:
+                stderr = stack.enter_context(tempfile.TemporaryFile())
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.socket_path)
+                sent_at = time.monotonic()
+                request = {'script': script, 'sent_at': sent_at, 'cpu': cpu, 'limits': limits, **(sandbox or {})}
+                socket.send_fds(conn, [json.dumps(request).encode()],
+                                [stdin.fileno(), write_fd, stderr.fileno()])
+                os.close(write_fd)
+                write_fd = None
+
+                reader = conn.makefile('r')
+                pid = json.loads(reader.readline())['pid']
+                kill = partial(self._kill, pid)
+                if cancel is not None:
+                    cancel.attach(kill)
+
+                # Wall-clock limit counts from the request, like a fresh interpreter would
+                timed_out = threading.Event()
+                def on_timeout():
+                    timed_out.set()
+                    kill()
+                timer = threading.Timer(max(0.0, wall_limit / 1000 - (time.monotonic() - sent_at)), on_timeout)
+                timer.start()
+                try:
+                    output_verdict = consume_output(read_fd, kill)
+                    # The supervisor reports once the runner has exited
+                    result = json.loads(reader.readline())
+                finally:
+                    timer.cancel()
+            finally:
+                conn.close()
+                os.close(read_fd)
+                if write_fd is not None:
+                    os.close(write_fd)
+
+            stderr.seek(0)
+            result['stderr'] = stderr.read(STDERR_LIMIT).decode(errors='replace')
+            result['timed_out'] = timed_out.is_set()
+            result['output_verdict'] = output_verdict
+            return result
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1])
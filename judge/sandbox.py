@@ -0,0 +1,174 @@
+"""Reusable sandbox slots that submissions run in.
+
+A slot is a private working directory and a stderr file. Optionally it also
+has its own user id, and a network namespace without interfaces. Slots are
+created once, leased per submission, and reset between runs, so judging a
+test does not create and delete a directory and a temporary file.
+
+User ids need the judge to run as root. Slot i runs as uid and gid
+`uid_base + i`, so a program cannot read the judge's files, signal the
+processes of other slots, or leave processes behind: they are killed when
+the slot is reset. Network namespaces also need root or CAP_SYS_ADMIN.
+Features the kernel refuses are turned off when the pool starts.
+"""
+import ctypes
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+CLONE_NEWNET = 0x40000000
+
+_libc = None
+
+
+def unshare_network():
+    """Move the calling process into a new network namespace with only a loopback device, which is down."""
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    if _libc.unshare(CLONE_NEWNET) != 0:
+        raise OSError(ctypes.get_errno(), 'unshare(CLONE_NEWNET) failed')
+
+
+class Slot:
+    """One working directory, stderr file and optional user id, used by one run at a time."""
+
+    def __init__(self, index: int, root: str, uid: Optional[int], isolate_network: bool):
+        self.index = index
+        self.root = root
+        self.uid = uid
+        self.isolate_network = isolate_network
+        self.path = None
+        self.stderr = None
+        self._create()
+
+    def _create(self):
+        self.path = tempfile.mkdtemp(prefix=f'slot-{self.index}-', dir=self.root)
+        if self.uid is not None:
+            os.chown(self.path, self.uid, self.uid)
+        if self.stderr is None:
+            self.stderr = tempfile.TemporaryFile(dir=self.root)
+
+    def isolate(self):
+        """Drop into the slot's namespace and user; runs in the child before exec."""
+        if self.isolate_network:
+            unshare_network()
+        if self.uid is not None:
+            os.setgroups([])
+            os.setgid(self.uid)
+            os.setuid(self.uid)
+
+    def sandbox(self):
+        """The slot as the forkserver expects it, see pyrunner._run_solution."""
+        return {'cwd': self.path, 'uid': self.uid, 'unshare_net': self.isolate_network}
+
+    def reset(self):
+        """Kill leftover processes and empty the working directory and stderr file.
+
+        A directory that cannot be emptied is abandoned for a new one.
+        """
+        if self.uid is not None:
+            kill_user_processes(self.uid)
+        self.stderr.seek(0)
+        self.stderr.truncate()
+        try:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.unlink(entry.path)
+        except OSError as e:
+            print(f"Sandbox slot {self.index} could not be cleaned, replacing it: {str(e)}")
+            self._create()
+
+    def healthy(self) -> bool:
+        return os.path.isdir(self.path) and os.access(self.path, os.W_OK) and not self.stderr.closed
+
+
+def kill_user_processes(uid: int):
+    """Kill every process running as `uid`, such as daemons a program forked off."""
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/status') as f:
+                for line in f:
+                    if line.startswith('Uid:'):
+                        if int(line.split()[1]) == uid:
+                            os.kill(int(name), signal.SIGKILL)
+                        break
+        except (OSError, ValueError):
+            pass  # The process exited meanwhile
+
+
+def probe(preexec) -> bool:
+    """Whether a child can start after running `preexec`."""
+    try:
+        return subprocess.run(['true'], preexec_fn=preexec, capture_output=True).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+class SandboxPool:
+    """A fixed set of slots under `root`, created on first use and shared by all submissions."""
+
+    def __init__(self, root: str, size: int, uid_base: Optional[int] = None, isolate_network: bool = False):
+        self.root = root
+        self.size = max(1, size)
+        self.uid_base = uid_base
+        self.isolate_network = isolate_network
+        self._free: List[Slot] = []
+        self._started = False
+        self._lock = threading.Condition()
+
+    def _start(self):
+        os.makedirs(self.root, exist_ok=True)
+        os.chmod(self.root, 0o711)  # Slot users reach their own directory only
+        if self.uid_base is not None and (not hasattr(os, 'getuid') or os.getuid() != 0):
+            print("Sandbox user ids need the judge to run as root, running as the judge's user")
+            self.uid_base = None
+        if self.isolate_network and not probe(unshare_network):
+            print("Sandbox network namespaces are not available, programs keep the judge's network")
+            self.isolate_network = False
+        for i in range(self.size):
+            uid = self.uid_base + i if self.uid_base is not None else None
+            self._free.append(Slot(i, self.root, uid, self.isolate_network))
+        self._started = True
+
+    @contextmanager
+    def lease(self, count: int = 1):
+        """Lease `count` slots at once, at most the pool size, waiting until they are free."""
+        count = max(1, min(count, self.size))
+        with self._lock:
+            if not self._started:
+                self._start()
+            while len(self._free) < count:
+                self._lock.wait()
+            slots = [self._free.pop() for _ in range(count)]
+        try:
+            yield slots
+        finally:
+            released = []
+            for slot in slots:
+                slot.reset()
+                if not slot.healthy():
+                    print(f"Sandbox slot {slot.index} failed its health check, replacing it")
+                    if not slot.stderr.closed:
+                        slot.stderr.close()
+                    slot = Slot(slot.index, self.root, slot.uid, self.isolate_network)
+                released.append(slot)
+            with self._lock:
+                self._free.extend(released)
+                # Waiters may need several slots each, so every one checks whether it fits now
+                self._lock.notify_all()
+
+    def stats(self):
+        """Return the slot count and how many are free."""
+        with self._lock:
+            return {'slots': self.size, 'free': len(self._free) if self._started else self.size}
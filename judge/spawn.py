@@ -0,0 +1,124 @@
+"""A small launcher that runs programs so their peak memory is their own.
+
+A process forked from the judge starts out sharing the judge's pages, and
+Linux keeps the peak resident set of a process across exec, so wait4()
+reports at least the size of whatever forked it. The launcher is a tiny C
+program: the judge starts it with the limits applied, it forks the real
+program and reports the program's wait status and rusage on a pipe:
+
+    <pid>\\n                                         once the program is forked
+    <wait status> <user usec> <system usec> <max rss KB>\\n   once it is reaped
+
+The program gets its own process group, so killing it leaves the launcher
+alive to report. The launcher is compiled on first use with `cc`; without a
+C compiler programs are forked from the judge directly.
+"""
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+SOURCE = r'''
+#include <errno.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+int main(int argc, char **argv) {
+    if (argc < 3) {
+        fprintf(stderr, "usage: %s <report fd> <program> [args...]\n", argv[0]);
+        return 125;
+    }
+    int report = atoi(argv[1]);
+    pid_t pid = fork();
+    if (pid < 0) {
+        perror("fork");
+        return 125;
+    }
+    if (pid == 0) {
+        close(report);
+        setpgid(0, 0);
+        execvp(argv[2], argv + 2);
+        fprintf(stderr, "%s: %s\n", argv[2], strerror(errno));
+        _exit(127);
+    }
+    setpgid(pid, pid);  /* Also here, so the group exists before the judge can signal it */
+    dprintf(report, "%d\n", (int) pid);
+    int status;
+    struct rusage usage;
+    while (wait4(pid, &status, 0, &usage) < 0) {
+        if (errno != EINTR) {
+            perror("wait4");
+            return 125;
+        }
+    }
+    dprintf(report, "%d %ld %ld %ld\n", status,
+            (long) usage.ru_utime.tv_sec * 1000000 + usage.ru_utime.tv_usec,
+            (long) usage.ru_stime.tv_sec * 1000000 + usage.ru_stime.tv_usec,
+            usage.ru_maxrss);
+    return 0;
+}
+'''
+
+
+class Launcher:
+    """The compiled launcher under `root`, built on first use."""
+
+    def __init__(self, root: str, compiler: str = 'cc'):
+        self.root = root
+        self.compiler = compiler
+        self._lock = threading.Lock()
+        self._prepared = False
+        self.path = None
+
+    def _build(self) -> str:
+        path = os.path.join(self.root, 'spawn-' + hashlib.sha256(SOURCE.encode()).hexdigest()[:16])
+        if os.access(path, os.X_OK):
+            return path
+        os.makedirs(self.root, exist_ok=True)
+        os.chmod(self.root, 0o755)  # Sandbox slots run it as other users
+        build_dir = tempfile.mkdtemp(prefix='.build-', dir=self.root)
+        try:
+            source_file = os.path.join(build_dir, 'spawn.c')
+            with open(source_file, 'w') as f:
+                f.write(SOURCE)
+            binary = os.path.join(build_dir, 'spawn')
+            result = subprocess.run([self.compiler, '-O2', source_file, '-o', binary], capture_output=True, text=True)
+            if result.returncode != 0:
+                raise OSError(result.stderr.strip())
+            os.chmod(binary, 0o755)
+            os.replace(binary, path)  # Judges on the same host may race to build it
+        finally:
+            for name in os.listdir(build_dir):
+                os.unlink(os.path.join(build_dir, name))
+            os.rmdir(build_dir)
+        return path
+
+    def prepare(self) -> Optional[str]:
+        """Path of the launcher, or None if it cannot be built."""
+        with self._lock:
+            if not self._prepared:
+                self._prepared = True
+                try:
+                    self.path = self._build()
+                except OSError as e:
+                    print(f"Process launcher is not available, peak memory includes the judge's own: {str(e)}")
+            return self.path
+
+
+def read_report(report) -> Optional[Dict[str, Any]]:
+    """Parse the launcher's line about the reaped program, None if the launcher died first."""
+    try:
+        status, user, system, max_rss = (int(value) for value in report.readline().split())
+    except ValueError:
+        return None
+    return {
+        'returncode': os.waitstatus_to_exitcode(status),
+        'cpu_time': (user + system) / 1000,
+        'memory_used': max_rss  # KB on Linux
+    }
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import tempfile
+from typing import Any, BinaryIO, Dict, List, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def pair_hash(input_hash: str, output_hash: str) -> str:
+    """Identify a test by its input and expected output; the judge runs repeated tests once."""
+    return hashlib.sha256((input_hash + output_hash).encode()).hexdigest()
+
+
+class TestDataStore:
+    """Content-addressed on-disk store for test inputs and outputs."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put_stream(self, stream: BinaryIO) -> Tuple[str, int]:
+        """Store a file-like object chunk by chunk and return its (hash, size)."""
+        h = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=self.root)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = h.hexdigest()
+            path = self.path(digest)
+            if os.path.exists(path):
+                os.unlink(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+            return digest, size
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def put(self, data: bytes) -> Tuple[str, int]:
+        """Store bytes and return their (hash, size)."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=self.root)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return digest, len(data)
+
+    def read_text(self, digest: str) -> str:
+        with open(self.path(digest), 'rb') as f:
+            return f.read().decode(errors='replace')
+
+    def store_test_case(self, test_case: Dict[str, Any]) -> Dict[str, Any]:
+        """Move an inline test case into the store, keeping only hashes and sizes."""
+        input_hash, input_size = self.put(test_case['input'].encode())
+        output_hash, output_size = self.put(test_case['output'].encode())
+        return {
+            'input_hash': input_hash,
+            'input_size': input_size,
+            'output_hash': output_hash,
+            'output_size': output_size,
+            'pair_hash': pair_hash(input_hash, output_hash),
+            'sample': bool(test_case.get('sample', False))
+        }
+
+    def resolve_batches(self, batches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add the on-disk paths the judge reads to every stored test case."""
+        resolved = []
+        for batch in batches:
+            test_cases = []
+            for test_case in batch['test_cases']:
+                if 'input_hash' in test_case:
+                    test_case = dict(test_case,
+                                     input_path=self.path(test_case['input_hash']),
+                                     output_path=self.path(test_case['output_hash']))
+                test_cases.append(test_case)
+            resolved.append(dict(batch, test_cases=test_cases))
+        return resolved
@@ -0,0 +1,138 @@
+"""Standalone judge worker.
+
+Leases jobs from the judge_job table in the contest database, judges them and
+writes the results back, so judge machines can be added during a contest
+without restarting the web server. Run the web server with JUDGE_MODE=remote.
+
+    python -m judge.worker --database sqlite:////srv/cms/instance/coding_contest.db --testdata /srv/cms/testdata
+
+The test data directory must hold the same files as the web server's
+TESTDATA_DIR, for example through a shared mount.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+from sqlalchemy import create_engine, event
+
+from judge.jobqueue import JobQueue
+from judge.judge import judge_submission
+from judge.testdata import TestDataStore
+
+
+def judge_job(payload, test_data: TestDataStore):
+    """Judge the payload of a job the same way the web server judges a submission."""
+    return judge_submission(
+        code=payload['code'],
+        language=payload['language'],
+        batches=test_data.resolve_batches(payload['batches']),
+        time_limit=payload['time_limit'],
+        memory_limit=payload['memory_limit'],
+        checker=payload.get('checker'),
+        is_run_code=payload.get('is_run_code', False)
+    )
+
+
+class Worker:
+    """Leases and judges jobs on `concurrency` threads until stopped."""
+
+    def __init__(self, jobs: JobQueue, test_data: TestDataStore, worker_id: str,
+                 concurrency: int = 1, lease_seconds: float = 30, poll_interval: float = 0.5):
+        self.jobs = jobs
+        self.test_data = test_data
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+
+    def run(self):
+        threads = [threading.Thread(target=self._work, name=f'judge-worker-{i}') for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def stop(self):
+        """Stop leasing new jobs; jobs being judged are finished first."""
+        self.stopping.set()
+
+    def _work(self):
+        while not self.stopping.is_set():
+            try:
+                job = self.jobs.lease(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                print(f"Lease error: {str(e)}")
+                job = None
+            if job is None:
+                self.stopping.wait(self.poll_interval)
+                continue
+            self._judge(job)
+
+    def _judge(self, job):
+        # Keep the lease alive while judging
+        done = threading.Event()
+        def heartbeat():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    if not self.jobs.heartbeat(job['id'], self.worker_id, self.lease_seconds):
+                        return
+                except Exception as e:
+                    print(f"Heartbeat error: {str(e)}")
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+
+        leased_at = time.time()
+        try:
+            result = judge_job(job['payload'], self.test_data)
+            result['queue_time'] = (leased_at - job['created_at']) * 1000
+        except Exception as e:
+            traceback.print_exc()
+            result = {'error': str(e)}
+        finally:
+            done.set()
+            heartbeat_thread.join()
+
+        if not self.jobs.complete(job['id'], self.worker_id, result):
+            print(f"Lost the lease on job {job['id']}, result discarded")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m judge.worker', description='Judge submissions from the shared job queue.')
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL', 'sqlite:///instance/coding_contest.db'),
+                        help='SQLAlchemy URL of the contest database')
+    parser.add_argument('--testdata', default=os.environ.get('TESTDATA_DIR', 'testdata'), help='test data directory')
+    parser.add_argument('--id', default=f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}',
+                        help='worker id shown in the job table')
+    parser.add_argument('--concurrency', type=int, default=int(os.environ.get('JUDGE_WORKERS', 1)),
+                        help='jobs judged at the same time')
+    parser.add_argument('--lease', type=float, default=30, help='seconds a job stays leased without a heartbeat')
+    parser.add_argument('--poll', type=float, default=0.5, help='seconds between polls of an empty queue')
+    args = parser.parse_args()
+
+    engine = create_engine(args.database, connect_args={'timeout': 30} if args.database.startswith('sqlite') else {})
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA busy_timeout=30000')
+            cursor.close()
+
+    jobs = JobQueue(engine)
+    jobs.create_table()
+    worker = Worker(jobs, TestDataStore(args.testdata), args.id, args.concurrency, args.lease, args.poll)
+
+    # Finish the jobs in hand on Ctrl-C or SIGTERM
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: worker.stop())
+    print(f"Judge worker {args.id} started with {worker.concurrency} thread(s)", flush=True)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Socket.IO message queue kept in a database table, for running several web processes without a broker.
+
+Every process appends the events it emits to the `socketio_message` table
+and polls the table for the events of the other processes. This adds a
+database write per emit and up to `poll_interval` of latency; a Redis or
+RabbitMQ queue does neither and is preferred for large contests.
+"""
+import time
+from typing import Any, Dict
+
+from socketio import PubSubManager
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, delete, func, insert, select
+from sqlalchemy.engine import Engine
+
+metadata = MetaData()
+
+socketio_messages = Table(
+    'socketio_message', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('channel', String(100), nullable=False),
+    Column('data', Text, nullable=False),  # A PubSubManager message as JSON
+    Column('created_at', Float, nullable=False),
+    sqlite_autoincrement=True  # Ids must keep growing after old messages are deleted
+)
+
+
+class DatabaseManager(PubSubManager):
+    """Socket.IO client manager that fans events out to other processes through a database table.
+
+    Messages older than `retention` seconds are deleted; a process that
+    stalls for longer misses them.
+    """
+    name = 'database'
+
+    def __init__(self, engine: Engine, channel: str = 'flask-socketio', write_only: bool = False,
+                 poll_interval: float = 0.1, retention: float = 60, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retention = retention
+
+    def create_table(self):
+        metadata.create_all(self.engine)
+
+    def _publish(self, data: Dict[str, Any]):
+        with self.engine.begin() as conn:
+            conn.execute(insert(socketio_messages).values(
+                channel=self.channel, data=self.json.dumps(data), created_at=time.time()
+            ))
+
+    def _listen(self):
+        with self.engine.connect() as conn:
+            last_id = conn.execute(select(func.max(socketio_messages.c.id))).scalar() or 0
+        last_pruned = time.time()
+        while True:
+            try:
+                with self.engine.connect() as conn:
+                    messages = conn.execute(
+                        select(socketio_messages.c.id, socketio_messages.c.data)
+                        .where(socketio_messages.c.id > last_id, socketio_messages.c.channel == self.channel)
+                        .order_by(socketio_messages.c.id)
+                    ).all()
+                if time.time() - last_pruned > self.retention:
+                    last_pruned = time.time()
+                    with self.engine.begin() as conn:
+                        conn.execute(delete(socketio_messages).where(socketio_messages.c.created_at < last_pruned - self.retention))
+            except Exception as e:
+                # Keep our place in the table, the next poll picks up what this one missed
+                print(f"Socket.IO message queue error: {str(e)}")
+                messages = []
+            for message_id, data in messages:
+                last_id = message_id
+                yield data
+            self.server.sleep(self.poll_interval)
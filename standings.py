@@ -0,0 +1,147 @@
+"""Standings folded from the score event log.
+
+Every judged submission appends an event to the log, and so do the resets,
+freezes and unfreezes that change how submissions count. The standings after
+any prefix of the log are its fold, a JSON state that can be checkpointed:
+
+    {'frozen': False, 'standings': {'<user id>:<problem id>': [points, time, public points, public time]}}
+
+Times are ISO strings. The public points and time only count submissions
+made while the leaderboard was not frozen, like Standing.public_points.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def empty_state() -> Dict[str, Any]:
+    return {'frozen': False, 'standings': {}}
+
+
+def standing_key(user_id: int, problem_id: int) -> str:
+    return f'{user_id}:{problem_id}'
+
+
+def iso(moment: Optional[datetime]) -> Optional[str]:
+    return moment.isoformat(timespec='microseconds') if moment is not None else None
+
+
+def better(points: int, time: str, best_points: int, best_time: Optional[str]) -> bool:
+    """More points win, equal points submitted earlier win."""
+    return best_time is None or points > best_points or (points == best_points and time < best_time)
+
+
+def apply_event(state: Dict[str, Any], event: Dict[str, Any]):
+    """Fold one event into the state, mirroring what the app does to the Standing table."""
+    kind = event['kind']
+    standings = state['standings']
+    if kind == 'judged':
+        if event['status'] != 'AC':
+            return
+        key = standing_key(event['user_id'], event['problem_id'])
+        points, time = event['points'] or 0, iso(event['submitted_at'])
+        entry = standings.setdefault(key, [0, None, 0, None])
+        if better(points, time, entry[0], entry[1]):
+            entry[0], entry[1] = points, time
+        if not event['frozen'] and better(points, time, entry[2], entry[3]):
+            entry[2], entry[3] = points, time
+    elif kind == 'reset':
+        # Scoped to a user and problem, a whole problem, or everything
+        if event['user_id'] is not None:
+            standings.pop(standing_key(event['user_id'], event['problem_id']), None)
+        elif event['problem_id'] is not None:
+            suffix = f":{event['problem_id']}"
+            for key in [key for key in standings if key.endswith(suffix)]:
+                del standings[key]
+        else:
+            standings.clear()
+    elif kind == 'freeze':
+        state['frozen'] = True
+    elif kind == 'unfreeze':
+        # Submissions made while frozen count for every later view, frozen or not
+        state['frozen'] = False
+        for entry in standings.values():
+            entry[2], entry[3] = entry[0], entry[1]
+
+
+def cell(state: Dict[str, Any], user_id: int, problem_id: int, is_frozen: bool) -> Tuple[int, Optional[str]]:
+    """Points and submission time of a user on a problem, as shown live or frozen."""
+    entry = state['standings'].get(standing_key(user_id, problem_id))
+    if entry is None:
+        return 0, None
+    return (entry[2], entry[3]) if is_frozen else (entry[0], entry[1])
+
+
+def clock(time: Optional[str]) -> Optional[str]:
+    return datetime.fromisoformat(time).strftime('%H:%M:%S') if time else None
+
+
+def rank_rows(rows: List[Dict[str, Any]]):
+    """Sort leaderboard rows by total points in descending order, equal totals share a rank."""
+    rows.sort(key=lambda x: x['total_points'], reverse=True)
+    for i, row in enumerate(rows):
+        if i > 0 and row['total_points'] == rows[i - 1]['total_points']:
+            row['rank'] = rows[i - 1]['rank']
+        else:
+            row['rank'] = i + 1
+
+
+def board(state: Dict[str, Any], users: List[Tuple[int, str]], problems: List[Dict[str, Any]],
+          is_frozen: bool) -> Dict[str, Any]:
+    """Build a leaderboard in the /leaderboard format from a state.
+
+    `users` are (id, username) pairs and `problems` dicts with id, title and shortname.
+    """
+    rows = []
+    for user_id, username in users:
+        row = {'user_id': user_id, 'username': username, 'total_points': 0, 'problem_points': []}
+        for problem in problems:
+            points, time = cell(state, user_id, problem['id'], is_frozen)
+            row['problem_points'].append({'points': points, 'submission_time': clock(time)})
+            row['total_points'] += points
+        rows.append(row)
+    rank_rows(rows)
+    return {'problems': problems, 'users': rows, 'is_frozen': is_frozen}
+
+
+def reveal_steps(state: Dict[str, Any], users: List[Tuple[int, str]],
+                 problems: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Steps that turn the frozen board of a state into its live board, for the unfreeze ceremony.
+
+    Each step reveals one hidden result: the lowest placed user with hidden
+    results reveals their leftmost one, then everyone is ranked again. Ties
+    are broken by user id, the same way for every step.
+    """
+    totals = {}
+    hidden = {}
+    for user_id, _ in users:
+        totals[user_id] = 0
+        for problem in problems:
+            public = cell(state, user_id, problem['id'], True)
+            totals[user_id] += public[0]
+            if cell(state, user_id, problem['id'], False) != public:
+                hidden.setdefault(user_id, []).append(problem['id'])
+
+    def rank(user_id):
+        return 1 + sum(1 for total in totals.values() if total > totals[user_id])
+
+    steps = []
+    while hidden:
+        user_id = min(hidden, key=lambda u: (totals[u], -u))
+        problem_id = hidden[user_id].pop(0)
+        if not hidden[user_id]:
+            del hidden[user_id]
+        previous_points = cell(state, user_id, problem_id, True)[0]
+        points, time = cell(state, user_id, problem_id, False)
+        previous_rank = rank(user_id)
+        totals[user_id] += points - previous_points
+        steps.append({
+            'user_id': user_id,
+            'problem_id': problem_id,
+            'previous_points': previous_points,
+            'points': points,
+            'submission_time': clock(time),
+            'total_points': totals[user_id],
+            'previous_rank': previous_rank,
+            'rank': rank(user_id)
+        })
+    return steps